@@ -67,6 +67,18 @@ class vars():
     step  = 1.0 / (rampColors -1)
     updateProgram = 0
 
+    # stored values of the current dcm volume, kept for re-windowing
+    volume_raw = None
+    volume_rescale = (1.0, 0.0)
+    volume_window = None
+    # numpy type of the texture data
+    volume_type = None
+    setting_window = False
+    # full resolution decode running behind a preview volume
+    volume_refine = None
+    # statistics per (SeriesInstanceUID, files, frames) of the imported slices
+    series_stats = {}
+
 #
 # Shader
 #
@@ -427,74 +439,227 @@ void main()
 
 
 import os
+import time
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
 #import bpy
 #from bgl import *
 from volume_render.pydicom import read_file
+# the pydicom modules import each other by the top level name
+from pydicom import config as dicom_config
+from pydicom.contrib.pydicom_series import scan_file, scan_frames, order_slices, SeriesIndex
+from pydicom.filereader import close_deferred_files
+
+# map deferred pixel data straight from the files instead of copying it
+dicom_config.pixel_data_mmap = True
+# values larger than this are read on access only, which maps PixelData
+dicomDeferSize = 16383
+
+from volume_render.imagestack import readPlane, stackPlanes
+
+import numpy
+
+# bgl.Buffer element type used to hold raw volume bytes, by numpy item size
+bufferTypes = {1: GL_BYTE, 2: GL_SHORT, 4: GL_FLOAT}
+
+# sized single channel formats, in case the bgl module does not define them
+GL_R8 = globals().get('GL_R8', 0x8229)
+GL_R16 = globals().get('GL_R16', 0x822A)
+GL_R16F = globals().get('GL_R16F', 0x822D)
+GL_R32F = globals().get('GL_R32F', 0x822E)
+GL_HALF_FLOAT = globals().get('GL_HALF_FLOAT', 0x140B)
+
+# numpy type of the volume -> (internal format, pixel type) of the 3D texture
+textureFormats = {
+    'uint8':   (GL_R8, GL_UNSIGNED_BYTE),
+    'uint16':  (GL_R16, GL_UNSIGNED_SHORT),
+    'float16': (GL_R16F, GL_HALF_FLOAT),
+    'float32': (GL_R32F, GL_FLOAT),
+}
+
+# texture precision option -> numpy type of the uploaded volume
+precisionTypes = {'8': 'uint8', '16': 'uint16', 'HALF': 'float16', 'FLOAT': 'float32'}
 
-try:
-    from PIL import Image, ImageMath
-    pil = True
-except:
-    pil = False
+def volumeType(precision, bits):
+    """numpy type of the texture data for a precision option and source bit depth"""
+    if precision == 'AUTO':
+        return numpy.dtype(numpy.uint8 if bits <= 8 else numpy.uint16)
+    return numpy.dtype(precisionTypes[precision])
+
+
+def storedRange(dtype):
+    """full range of the values an image plane type can store"""
+    if dtype.kind in 'iu':
+        info = numpy.iinfo(dtype)
+        return (float(info.min), float(info.max))
+    return (0.0, 1.0)
  
-def loadVolume(dirName, filelist, texture):
-    """read volume from directory as a 3D texture"""
+def loadVolume(dirName, filelist, texture, precision='AUTO', cache=True, start_slice=0, max_slices=0, z_stride=1):
+    """read volume from directory as a 3D texture
+
+    Every page of a multi-page TIFF is a slice. Only the slices chosen by
+    selectSlices are decoded.
+    """
+    # a running refinement of a dcm import would overwrite the texture
+    cancelRefine()
+
     # list images in directory
-    #dirname = os.path.dirname(dirName)
+    planes = selectSlices(stackPlanes(volumeFiles(dirName, filelist)), start_slice, max_slices, z_stride)
+
+    print('loading mages from: %s' % dirName)
+    start = time.time()
+
+    slabs = imageSlabs(planes, precision)
+    if cache:
+        files = sorted(set(file_path for file_path, page in planes))
+        key = cacheKey(files, 'image', precision, planes)
+        cached = cacheLoad(key)
+        if cached:
+            print('using cached volume %s' % key)
+            slabs = storedSlabs(cached[0])
+        else:
+            slabs = cachingSlabs(key, len(planes), slabs, {})
+
+    # load data into 3D texture slab by slab
+    depth, height, width = uploadSlabs(texture, len(planes), slabs)
+    print('volume data dims: %d %d %d' % (width, height, depth))
+    printThroughput(depth * height * width * vars.volume_type.itemsize, time.time() - start)
+
+    #return texture
+    return (width, height, depth)
+
+
+def readImage(file_path, page=0):
+    """read the first channel of an image plane as a 2D array, with its bits per sample"""
+    try:
+        plane = readPlane(file_path, page)
+        bits = plane.dtype.itemsize * 8
+    except ValueError:
+        if page != 0:
+            raise
+        # no NumPy decoder for the format (JPEG without PIL), let Blender read it
+        imgData = bpy.data.images.load(file_path)
+        bits = imgData.depth // imgData.channels
+        plane = numpy.array(imgData.pixels[:], numpy.float32)[::imgData.channels]
+        plane = plane.reshape(imgData.size[1], imgData.size[0])
+        bpy.data.images.remove(imgData)
+    return plane, bits
+
+
+def imageSlabs(planes, precision='AUTO'):
+    """read (file, page) image planes into slabs of texture planes
+
+    Yields (z, planes, buf) for every slabDepth image planes; all slabs
+    share the memory of one.
+    """
+    depth = len(planes)
+    for z, (file_path, page) in enumerate(planes):
+        plane, bits = readImage(file_path, page)
+
+        # check if all are of the same size
+        if z == 0:
+            height, width = plane.shape
+            slab, buf = newSlab((depth, height, width), volumeType(precision, bits))
+        elif plane.shape != (height, width):
+            print('mismatch')
+            raise RuntimeError("image size mismatch")
+
+        # scale the stored range of the image onto the texture type
+        index = z % slabDepth
+        quantizeVolume(plane[None], slab[index:index + 1], (1.0, 0.0), storedRange(plane.dtype))
+        if index == slabDepth - 1 or z == depth - 1:
+            yield z - index, slab[:index + 1], buf
+
 
+def storedSlabs(volume):
+    """slabs of a complete (depth, height, width) volume, such as a cache hit"""
+    for z in range(0, volume.shape[0], slabDepth):
+        yield z, volume[z:z + slabDepth], None
+
+
+def volumeFiles(dirName, filelist, extension=None):
+    """return the absolute paths of the selected files, or of the whole directory"""
     if filelist[0].name == "":
         files = sorted(os.listdir(dirName))
     else:
-        files = filelist
-
-    print('loading mages from: %s' % dirName)
+        files = [file.name for file in filelist]
 
-    depth = 0
-    width, height = 0, 0
+    paths = []
     for file in files:
-        if hasattr(file, 'name'):
-            file_path = os.path.abspath(os.path.join(dirName, file.name))
-        else:
-            file_path = os.path.abspath(os.path.join(dirName, file))
-        #try:
-        if pil == True:
-            imgData = Image.open(file_path)
-
-            # check if all are of the same size
-            if depth is 0:
-                width, height = imgData.size[0], imgData.size[1] 
-                data = Buffer(GL_BYTE, [len(files), width * height])
-                data[depth] = imgData.getdata(0) # 0 = "R" ##imgData.convert("L").getdata()
-            else:
-                if (width, height) == (imgData.size[0], imgData.size[1]):
-                    data[depth] = imgData.getdata(0)
-                else:
-                    print('mismatch')
-                    raise RunTimeError("image size mismatch")
-        else:
-            imgData = bpy.data.images.load(file_path)
+        if extension and not file.endswith(extension):
+            print('skipping junk file: ' + file)
+            continue
+        paths.append(os.path.abspath(os.path.join(dirName, file)))
 
-            if depth is 0:
-                width, height = imgData.size
-                data = Buffer(GL_FLOAT, [len(files), width * height])
-                data[depth] = list(imgData.pixels)[::4]
-            else:
-                if (width, height) == (imgData.size[0], imgData.size[1]):
-                    data[depth] = list(imgData.pixels)[::4]
-                else:
-                    print('mismatch')
-                    raise RunTimeError("image size mismatch")
+    return paths
 
-            bpy.data.images.remove(imgData)
 
-        depth += 1
-        #except:
-            #print('Invalid image: %s' % file_path)
+def selectSlices(slices, start=0, count=0, stride=1):
+    """every stride-th of slices from start on, at most count of them (all if count < 1)"""
+    selected = slices[max(start, 0)::max(stride, 1)]
+    if not selected:
+        raise ValueError('no slices to import from start slice %d of %d slices' % (start, len(slices)))
+    if count > 0:
+        selected = selected[:count]
+    if len(selected) < len(slices):
+        print('importing %d of %d slices' % (len(selected), len(slices)))
+    return selected
+
+
+def newVolume(shape, dtype):
+    """preallocate a contiguous (depth, height, width) volume for a 3D texture
+
+    Where bgl.Buffer supports the buffer protocol the array is a view onto
+    the Buffer memory, so slices are decoded straight into the memory that
+    glTexSubImage3D reads from. Otherwise the returned Buffer is None and
+    uploadSlab creates one from the array.
+    """
+    dtype = numpy.dtype(dtype)
+    count = int(numpy.prod(shape))
+    try:
+        buf = Buffer(bufferTypes[dtype.itemsize], count)
+        volume = numpy.frombuffer(buf, dtype, count).reshape(shape)
+    except (TypeError, ValueError, BufferError):
+        return numpy.empty(shape, dtype), None
+
+    if not volume.flags.writeable:
+        return numpy.empty(shape, dtype), None
+
+    return volume, buf
+
+
+def volumeBuffer(volume):
+    """copy a (depth, height, width) array into a bgl.Buffer"""
+    depth, height, width = volume.shape
+    # bgl converts sequences by value, so hand over the bits as plain integers
+    source = volume
+    if volume.dtype.kind != 'f' or volume.dtype.itemsize != 4:
+        source = volume.view('int%d' % (8 * volume.dtype.itemsize))
+    return Buffer(bufferTypes[volume.dtype.itemsize], [depth, height * width],
+                  source.reshape(depth, height * width))
+
+
+# z-planes per glTexSubImage3D call; slabs bound the host memory of uploads
+slabDepth = 16
+
+def newSlab(shape, dtype):
+    """preallocate one slab of z-planes for a (depth, height, width) volume, see newVolume"""
+    return newVolume((min(slabDepth, shape[0]),) + tuple(shape[1:]), dtype)
 
-    # load image data into single array
-    print('volume data dims: %d %d %d' % (width, height, depth))
 
-    # load data into 3D texture
+def allocateTexture(texture, shape, dtype):
+    """define the storage of a 3D texture for a (depth, height, width) volume, without data
+
+    The bgl of Blender 2.7x only accepts a Buffer as glTexImage3D pixels,
+    so there the storage is defined from a zeroed Buffer of the whole
+    volume. That Buffer lives only for the glTexImage3D call, but it makes
+    the peak host memory of an upload one volume instead of one slab.
+    """
+    depth, height, width = shape
+    internalFormat, pixelType = textureFormats[numpy.dtype(dtype).name]
+
     glPixelStorei(GL_UNPACK_ALIGNMENT,1)
     glBindTexture(GL_TEXTURE_3D, texture)
     glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
@@ -502,82 +667,699 @@ def loadVolume(dirName, filelist, texture):
     glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_WRAP_R, GL_CLAMP_TO_BORDER)
     glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
     glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    try:
+        glTexImage3D(GL_TEXTURE_3D, 0, internalFormat, width, height, depth, 0, 
+                     GL_RED, pixelType, None)
+    except TypeError:
+        # this bgl only accepts a Buffer, so the storage is defined with zeros;
+        # glTexSubImage3D cannot replace this, it only fills defined storage
+        glTexImage3D(GL_TEXTURE_3D, 0, internalFormat, width, height, depth, 0, 
+                     GL_RED, pixelType, Buffer(bufferTypes[numpy.dtype(dtype).itemsize], depth * height * width))
+    vars.volume_type = numpy.dtype(dtype)
+
+
+def uploadSlab(texture, slab, z, buf=None):
+    """replace the z-planes z to z + len(slab) of a texture defined by allocateTexture
+
+    buf may hold the slab at its start, as returned by newSlab.
+    """
+    depth, height, width = slab.shape
+    internalFormat, pixelType = textureFormats[slab.dtype.name]
+
+    if buf is None:
+        buf = volumeBuffer(slab)
+
+    glPixelStorei(GL_UNPACK_ALIGNMENT,1)
+    glBindTexture(GL_TEXTURE_3D, texture)
+    glTexSubImage3D(GL_TEXTURE_3D, 0, 0, 0, z, width, height, depth,
+                    GL_RED, pixelType, buf)
+
+
+def uploadSlabs(texture, depth, slabs):
+    """stream (z, planes, buf) slabs into a 3D texture of depth z-planes
+
+    The texture is allocated from the size and type of the first slab and
+    every slab is uploaded before the next one is requested, so slabs may
+    share their memory. Returns the shape of the volume. See allocateTexture
+    for the one full size allocation that remains with the bgl of Blender 2.7x.
+    """
+    shape = None
+    for z, planes, buf in slabs:
+        if shape is None:
+            shape = (depth,) + planes.shape[1:]
+            allocateTexture(texture, shape, planes.dtype)
+        uploadSlab(texture, planes, z, buf)
+    return shape
+
+
+def quantizedSlabs(raw, rescale, window, dtype):
+    """quantize raw into slabs of texture planes, see quantizeVolume"""
+    slab, buf = newSlab(raw.shape, dtype)
+    for z in range(0, raw.shape[0], slabDepth):
+        source = raw[z:z + slabDepth]
+        planes = slab[:len(source)]
+        quantizeVolume(source, planes, rescale, window)
+        yield z, planes, buf
+
+
+def printThroughput(nbytes, seconds):
+    megabytes = nbytes / (1024.0 * 1024.0)
+    print('loaded %.1f MB in %.2f s (%.1f MB/s)' % (megabytes, seconds, megabytes / max(seconds, 1e-6)))
+
+
+def decodeSlices(volume, files, workers=1, first=None, rescale=None, progress=None, cancel=None):
+    """decode the dcm files into the z-planes of volume, in file order
+
+    Each worker parses one file and copies its pixels into the plane that
+    was assigned to it, so every slice is copied exactly once. Threads are
+    used because all workers write into the same (GL upload) memory; file
+    reads and the numpy copies release the GIL.
+    If given, rescale[z] receives the RescaleSlope/RescaleIntercept of slice z
+    and progress(count) is called whenever the first count planes are done.
+    Once the threading.Event cancel is set, the slices not started yet are
+    skipped and CancelledError is raised.
+    """
+    depth, height, width = volume.shape
+
+    def decode(z):
+        if cancel is not None and cancel.is_set():
+            raise CancelledError()
+        if z == 0 and first is not None:
+            ds = first
+        else:
+            ds = read_file(files[z], defer_size=dicomDeferSize)
+
+        pixels = ds.pixel_array
+        if pixels.shape != (height, width):
+            print('mismatch: %s' % files[z])
+            raise RuntimeError("image size mismatch")
+
+        # converts to the volume type while copying into the preassigned plane
+        volume[z] = pixels
+        if rescale is not None:
+            rescale[z] = (float(ds.get('RescaleSlope', 1.0)), float(ds.get('RescaleIntercept', 0.0)))
+        return pixels.nbytes
+
+    def decodeAll(sizes):
+        total = 0
+        for z, size in enumerate(sizes):
+            total += size
+            if progress is not None:
+                progress(z + 1)
+        return total
+
+    if workers > 1 and depth > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return decodeAll(pool.map(decode, range(depth)))
+
+    return decodeAll(decode(z) for z in range(depth))
 
-    if pil == True:
-        glTexImage3D(GL_TEXTURE_3D, 0, GL_RED, width, height, depth, 0, 
-                     GL_RED, GL_UNSIGNED_BYTE, data)
+
+# percentiles used for the 'PERCENTILE' window
+percentileRange = (0.5, 99.5)
+
+def volumeStats(volume, rescale=(1.0, 0.0), slab=16):
+    """global min, max and percentiles of the rescaled volume
+
+    Stored values of up to 16 bits are counted slab by slab into an exact
+    histogram, so all statistics come out of one pass without a full size
+    temporary. Wider or float data takes its percentiles from a strided
+    subsample instead.
+    """
+    depth = volume.shape[0]
+    slope, intercept = rescale
+
+    if volume.dtype.kind in 'iu' and volume.dtype.itemsize <= 2:
+        offset = -int(numpy.iinfo(volume.dtype).min)
+        counts = numpy.zeros(1 << (8 * volume.dtype.itemsize), numpy.int64)
+        for z in range(0, depth, slab):
+            values = volume[z:z + slab].astype(numpy.int32).ravel()
+            values += offset
+            counts += numpy.bincount(values, minlength=counts.size)
+
+        stored = numpy.flatnonzero(counts)
+        cumulative = numpy.cumsum(counts)
+        ranks = numpy.array(percentileRange) / 100.0 * cumulative[-1]
+        low, high = numpy.searchsorted(cumulative, ranks)
+        values = numpy.array([stored[0], stored[-1], low, high], numpy.float64) - offset
     else:
-        glTexImage3D(GL_TEXTURE_3D, 0, GL_RED, width, height, depth, 0, 
-                     GL_RED, GL_FLOAT, data)
-    #return texture
-    return (width, height, depth)
+        minimum = min(volume[z:z + slab].min() for z in range(0, depth, slab))
+        maximum = max(volume[z:z + slab].max() for z in range(0, depth, slab))
+        low, high = numpy.percentile(volume[:, ::4, ::4], percentileRange)
+        values = numpy.array([minimum, maximum, low, high], numpy.float64)
 
+    values = values * slope + intercept
+    if slope < 0:
+        values = values[[1, 0, 3, 2]]
 
-def loadDCMVolume(dirName, filelist, texture):
-    """read dcm volume from directory as a 3D texture"""
-    # list images in directory
-    if filelist[0].name == "":
-        files = sorted(os.listdir(dirName))
+    return {'min': values[0], 'max': values[1], 'low': values[2], 'high': values[3]}
+
+
+def firstValue(value):
+    """first number of a possibly multi-valued element"""
+    try:
+        return float(value[0])
+    except TypeError:
+        return float(value)
+
+
+def volumeWindow(stats, mode='FULL', preset=None):
+    """return the (low, high) rescaled values that map to 0 and 1"""
+    if mode == 'PRESET':
+        if preset is not None:
+            center, width = preset
+            return (center - width / 2.0, center + width / 2.0)
+        print('no window preset stored, using full range')
+    elif mode == 'PERCENTILE':
+        return (stats['low'], stats['high'])
+
+    return (stats['min'], stats['max'])
+
+
+def quantizeVolume(raw, volume, rescale, window, slab=16):
+    """rescale and window raw into the texture volume, slab by slab
+
+    Float volumes receive 0..1, unsigned integer volumes the full range of
+    their type, which GL maps back to 0..1 for R8/R16 textures.
+    """
+    slope, intercept = rescale
+    low, high = window
+    width = max(high - low, 1e-6)
+    top = 1.0
+    if volume.dtype.kind == 'u':
+        top = float(numpy.iinfo(volume.dtype).max)
+    scale = numpy.float32(slope / width * top)
+    offset = numpy.float32((intercept - low) / width * top)
+
+    # float32 volumes are computed in place, others through one slab of floats
+    inplace = volume.dtype == numpy.float32
+    if not inplace:
+        planes = numpy.empty((min(slab, raw.shape[0]),) + raw.shape[1:], numpy.float32)
+
+    for z in range(0, raw.shape[0], slab):
+        source = raw[z:z + slab]
+        plane = volume[z:z + slab] if inplace else planes[:len(source)]
+        numpy.multiply(source, scale, out=plane, casting='unsafe')
+        plane += offset
+        numpy.clip(plane, 0.0, top, out=plane)
+        if not inplace:
+            if volume.dtype.kind == 'u':
+                plane += 0.5 # round to nearest
+            volume[z:z + slab] = plane
+
+
+def rewindowVolume(texture, window):
+    """re-quantize the current dcm volume for a new window, without reading files"""
+    if vars.volume_refine is not None and vars.volume_refine['upload'] is not None:
+        # the texture is being refined, the remaining slabs use the new window
+        vars.volume_window = window
+        return
+
+    raw = vars.volume_raw
+    uploadSlabs(texture, len(raw), quantizedSlabs(raw, vars.volume_rescale, window, vars.volume_type))
+    vars.volume_window = window
+
+
+def windowPreset(ds):
+    """stored (WindowCenter, WindowWidth) of a dataset, or None"""
+    if 'WindowCenter' in ds and 'WindowWidth' in ds:
+        return (firstValue(ds.WindowCenter), firstValue(ds.WindowWidth))
+    return None
+
+
+def scanDCMSeries(files, workers=1, index=None):
+    """read only the headers of dcm files and keep the largest series
+
+    Returns the headers of the slices in that series, ordered along the
+    slice normal, and the measured distance between slices (or None).
+    Multi-frame files contribute one header per frame. With a SeriesIndex
+    only the headers of files that are new or changed since an earlier
+    import are read.
+    """
+    if index is not None:
+        index.update(files, workers=max(1, workers))
+        headers = index.headers(files)
     else:
-        files = filelist
+        with ThreadPoolExecutor(max(1, workers)) as pool:
+            headers = [header for header in pool.map(scan_file, files) if header is not None]
+    if not headers:
+        raise ValueError('no dicom images found')
+
+    series = {}
+    for header in headers:
+        series.setdefault(header.suid, []).append(header)
+    # weighted by frames, so one enhanced multi-frame file beats a scout of a few single-frame files
+    slices = lambda headers: sum(max(header.frames, 1) for header in headers)
+    largest = max(series.values(), key=slices)
+    if len(series) > 1:
+        print('found %d series, loading %s with %d slices' % (len(series), largest[0].suid, slices(largest)))
+
+    if any(header.frames > 1 for header in largest):
+        # enhanced images hold the slices as frames, with their positions in functional groups;
+        # all headers need a frame index, so files without readable frames are left out
+        frames, skipped = [], []
+        for header in largest:
+            scanned = scan_frames(header.filename) if header.frames > 1 else None
+            if scanned:
+                frames.extend(scanned)
+            else:
+                skipped.append(header.filename)
+        if skipped:
+            print('skipping %d single-frame or unreadable files of the multi-frame series' % len(skipped))
+        if not frames:
+            raise ValueError('no frames could be read from the multi-frame series')
+        largest = frames
+
+    headers, spacing, gaps, duplicates = order_slices(largest)
+    if duplicates:
+        print('skipping %d slices at duplicate positions' % len(duplicates))
+    for gap in gaps:
+        print('missing slices after %s' % headers[gap].filename)
+    return headers, spacing
+
+
+def readDCMSeries(files, workers=1, first=None):
+    """decode dcm files into a volume of stored values
+
+    Returns the volume and a dict with its rescale, statistics, voxel
+    spacing, bit depth and window preset.
+    """
+    # the first slice decides the size and stored type of the whole volume
+    ds = read_file(files[0], defer_size=dicomDeferSize) if first is None else first
+    depth = len(files)
+    height, width = ds.pixel_array.shape
+    raw = numpy.empty((depth, height, width), ds.pixel_array.dtype)
+    rescale = numpy.empty((depth, 2))
 
-    print('loading mages from: %s' % dirName)
+    decodeSlices(raw, files, workers, ds, rescale)
+    return seriesInfo(raw, rescale, ds, files)
 
-    depth = 0
-    width, height = 0, 0
-    for file in files:
-        #skip non dcm files
-        if hasattr(file, 'name'):
-            if not file.name.endswith(".dcm"): 
-                print('skipping junk file: ' + file)
-                continue
-            file_path = os.path.abspath(os.path.join(dirName, file.name))
-        else:
-            if not file.endswith(".dcm"): 
-                print('skipping junk file: ' + file)
-                continue
-            file_path = os.path.abspath(os.path.join(dirName, file))
 
-        #try:
-        # read image
-        ds = read_file(file_path)
-        img_size = ds.pixel_array.shape
-        imgData = ds.pixel_array.flat.copy().astype("f")
-        #imgData = ds.PixelData
-        maximum = max(imgData)
+def readDCMFrames(headers):
+    """decode the frames of multi-frame dcm files into a volume, in header order
 
-        # check if all are of the same size
-        if depth is 0:
-            width, height = img_size[0], img_size[1] 
-            data = Buffer(GL_FLOAT, [len(files), width * height])
-            data[depth] = imgData/maximum
+    Returns the volume of stored values and its info, like readDCMSeries.
+    Every file is read once and only the frames of the headers are taken
+    from it, so frames left out of compressed files are never decoded.
+    """
+    files = [header.filename for header in headers]
+    raw = None
+    for file_path in sorted(set(files)):
+        ds = read_file(file_path, defer_size=dicomDeferSize)
+        for z, header in enumerate(headers):
+            if header.filename == file_path:
+                pixels = ds.get_frame(header.frame or 0)
+                if raw is None:
+                    first = ds
+                    raw = numpy.empty((len(headers),) + pixels.shape, pixels.dtype)
+                raw[z] = pixels
+
+    rescale = numpy.array([(header.slope, header.intercept) for header in headers])
+    return seriesInfo(raw, rescale, first, files, [header.frame for header in headers])
+
+
+def seriesInfo(raw, rescale, ds, files, frames=None):
+    """rescale, statistics and meta data of a decoded series
+
+    Returns the volume, rescaled to float if the rescale differs per slice,
+    and its info dict. ds is the dataset of the first slice, frames the
+    frame numbers of multi-frame slices.
+    """
+    slope, intercept = rescale[0]
+    if (rescale != rescale[0]).any():
+        # rescale differs per slice, so keep rescaled values instead
+        raw = raw.astype(numpy.float32)
+        raw *= rescale[:, 0, None, None]
+        raw += rescale[:, 1, None, None]
+        slope, intercept = 1.0, 0.0
+
+    # the statistics belong to the selected slices, not just to their number
+    key = (str(ds.get('SeriesInstanceUID', files[0])), tuple(files), tuple(frames or ()))
+    if key not in vars.series_stats:
+        vars.series_stats[key] = volumeStats(raw, (slope, intercept))
+
+    # enhanced images keep the spacing in functional groups, see scanDCMSeries
+    pixelSpacing = ds.get('PixelSpacing', [1.0, 1.0])
+    info = {
+        'rescale': [float(slope), float(intercept)],
+        'stats': dict((name, float(value)) for name, value in vars.series_stats[key].items()),
+        'spacing': [float(pixelSpacing[1]), float(pixelSpacing[0]), float(ds.get('SliceThickness', 1.0))],
+        'bits': int(ds.BitsStored),
+        'preset': windowPreset(ds),
+    }
+    return raw, info
+
+
+def previewDCMVolume(files, factor, workers=1):
+    """decode every factor-th dcm file and box filter the slices by factor
+
+    Returns a volume of about 1/factor the size along every axis and its info.
+    """
+    raw, info = readDCMSeries(files[::factor], workers)
+    depth, height, width = raw.shape
+    height, width = height // factor, width // factor
+    blocks = raw[:, :height * factor, :width * factor].reshape(depth, height, factor, width, factor)
+    return blocks.mean(axis=(2, 4), dtype=numpy.float32), info
+
+
+def refineDCMVolume(files, workers=1, key=None, spacing=None, mode='FULL'):
+    """start decoding the full resolution volume in a background thread
+
+    Returns the state that refineStep uploads from as slabs get decoded,
+    one slab per timer event. mode is the window mode of the import, see
+    volumeWindow.
+    """
+    first = read_file(files[0], defer_size=dicomDeferSize)
+    height, width = first.pixel_array.shape
+    refine = {
+        'files': files,
+        'first': first,
+        'key': key,
+        'spacing': spacing,
+        'mode': mode,
+        'raw': numpy.empty((len(files), height, width), first.pixel_array.dtype),
+        'rescale': numpy.empty((len(files), 2)),
+        'decoded': 0,
+        'uploaded': 0,
+        'upload': None,
+        'window': None,
+        'stale': False,
+        'error': None,
+        'cancel': threading.Event(),
+        'start': time.time(),
+    }
+
+    def progress(count):
+        refine['decoded'] = count
+
+    def decode():
+        try:
+            decodeSlices(refine['raw'], files, workers, first, refine['rescale'], progress, refine['cancel'])
+        except CancelledError:
+            # abandoned by cancelRefine, don't hold on to the partial volume
+            refine['raw'] = None
+        except Exception as error:
+            refine['error'] = error
+        finally:
+            close_deferred_files()
+
+    threading.Thread(target=decode, daemon=True).start()
+    return refine
+
+
+def cancelRefine():
+    """abandon the running refinement, its thread stops after the slices in progress"""
+    if vars.volume_refine is not None:
+        vars.volume_refine['cancel'].set()
+        vars.volume_refine = None
+
+
+def refineStep(texture, refine):
+    """replace the next decoded slab of the preview texture, returns True when done"""
+    raw, rescale = refine['raw'], refine['rescale']
+    depth, height, width = raw.shape
+
+    if refine['upload'] is None:
+        # allocate the full size texture, filled with the enlarged preview
+        preview = numpy.empty(vars.volume_raw.shape, vars.volume_type)
+        quantizeVolume(vars.volume_raw, preview, vars.volume_rescale, vars.volume_window)
+        rows = numpy.arange(height) * preview.shape[1] // height
+        columns = numpy.arange(width) * preview.shape[2] // width
+        slab, buf = newSlab(raw.shape, preview.dtype)
+
+        def enlargedSlabs():
+            for start in range(0, depth, slabDepth):
+                planes = slab[:len(raw[start:start + slabDepth])]
+                for z in range(len(planes)):
+                    planes[z] = preview[(start + z) * preview.shape[0] // depth][rows][:, columns]
+                yield start, planes, buf
+
+        uploadSlabs(texture, depth, enlargedSlabs())
+        refine['upload'] = (slab, buf)
+        refine['window'] = vars.volume_window
+
+    start = refine['uploaded']
+    end = min(start + slabDepth, refine['decoded'])
+    if end - start < slabDepth and end < depth:
+        return False
+
+    slab, buf = refine['upload']
+    planes = slab[:end - start]
+    window = vars.volume_window
+    if window != refine['window']:
+        refine['stale'] = True
+    for z in range(start, end):
+        quantizeVolume(raw[z:z + 1], planes[z - start:z - start + 1], rescale[z], window)
+    uploadSlab(texture, planes, start, buf)
+    refine['uploaded'] = end
+    if end < depth:
+        return False
+
+    raw, info = seriesInfo(raw, rescale, refine['first'], refine['files'])
+    if refine['spacing']:
+        info['spacing'][2] = refine['spacing']
+    if refine['key'] is not None:
+        cacheStore(refine['key'], raw, info)
+
+    vars.volume_refine = None
+    vars.volume_raw = raw
+    vars.volume_rescale = tuple(info['rescale'])
+    if not refine['stale']:
+        # the preview was windowed with the statistics of the box filtered slices
+        window = volumeWindow(info['stats'], refine['mode'], info['preset'])
+    if refine['stale'] or window != refine['window']:
+        rewindowVolume(texture, window)
+    print('refined volume to %d %d %d' % (width, height, depth))
+    printThroughput(raw.nbytes, time.time() - refine['start'])
+    return True
+
+
+def loadDCMVolume(dirName, filelist, texture, workers=1, window='FULL', precision='AUTO', cache=True, preview=1,
+                  start_slice=0, max_slices=0, z_stride=1):
+    """read dcm volume from directory as a 3D texture
+
+    Slices are chosen by selectSlices after sorting the headers, so only
+    their pixel data is decoded. With a preview factor above 1 a reduced
+    volume is loaded first and vars.volume_refine is set up to replace it
+    at full resolution.
+    """
+    # a running refinement of an earlier import is abandoned
+    cancelRefine()
+
+    # list images in directory
+    files = volumeFiles(dirName, filelist, ".dcm")
+
+    print('loading mages from: %s' % dirName)
+    start = time.time()
+
+    index = openSeriesIndex(dirName) if cache else None
+    try:
+        headers, spacing = scanDCMSeries(files, workers, index)
+    finally:
+        if index is not None:
+            index.close()
+    headers = selectSlices(headers, start_slice, max_slices, z_stride)
+    files = [header.filename for header in headers]
+    frames = headers[0].frame is not None
+
+    cached = None
+    if cache:
+        if frames:
+            key = cacheKey(sorted(set(files)), 'dcm', headers[0].suid, [header.frame for header in headers])
         else:
-            if (width, height) == (img_size[0], img_size[1]):
-                #data[depth] = imgData[::2]
-                data[depth] = imgData/maximum
-            else:
-                print('mismatch')
-                raise RunTimeError("image size mismatch")
-            
-        depth += 1
-        #except:
-            #print('Invalid image: %s' % file_path)
-
-    # load image data into single array
+            key = cacheKey(files, 'dcm', headers[0].suid)
+        cached = cacheLoad(key)
+
+    refine = None
+    if cached:
+        raw, info = cached
+        print('using cached volume %s' % key)
+    else:
+        if frames:
+            # a multi-frame volume is decoded in one go, without preview
+            raw, info = readDCMFrames(headers)
+        elif preview > 1 and len(files) > preview:
+            raw, info = previewDCMVolume(files, preview, workers)
+            refine = refineDCMVolume(files, workers, key if cache else None, mode=window)
+        else:
+            raw, info = readDCMSeries(files, workers)
+
+        # the distance between slice positions, SliceThickness if it was not measured
+        if not spacing:
+            spacing = info['spacing'][2]
+        info['spacing'][2] = spacing * max(z_stride, 1)
+        if refine is not None:
+            refine['spacing'] = info['spacing'][2]
+        if headers[0].spacing:
+            info['spacing'][:2] = [headers[0].spacing[1], headers[0].spacing[0]]
+        if cache and refine is None:
+            cacheStore(key, raw, info)
+        if refine is None:
+            # don't keep the files of the series open once they are read
+            close_deferred_files()
+
+    depth, height, width = raw.shape
+    stats = info['stats']
+    vars.volume_raw = raw
+    vars.volume_rescale = tuple(info['rescale'])
+    vars.volume_type = volumeType(precision, info['bits'])
+
     print('volume data dims: %d %d %d' % (width, height, depth))
+    print('value range %g to %g, percentiles %g to %g' % (stats['min'], stats['max'], stats['low'], stats['high']))
 
-    # load data into 3D texture
-    glPixelStorei(GL_UNPACK_ALIGNMENT,1)
-    glBindTexture(GL_TEXTURE_3D, texture)
-    glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
-    glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
-    glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_WRAP_R, GL_CLAMP_TO_BORDER)
-    glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexParameterf(GL_TEXTURE_3D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexImage3D(GL_TEXTURE_3D, 0,  GL_RED, width, height, depth, 0, 
-                 GL_RED,  GL_FLOAT, data)
+    # normalize with the series wide window and load data into 3D texture
+    rewindowVolume(texture, volumeWindow(stats, window, info['preset']))
+    printThroughput(raw.nbytes, time.time() - start)
+
+    if refine is not None:
+        vars.volume_refine = refine
+        depth, height, width = refine['raw'].shape
+    return (width, height, depth) + tuple(info['spacing'])
+
+
+#
+# Volume cache
+#
+# Volumes are stored as .npy files, so a cache hit is a numpy memory map,
+# next to a .json file with their meta data. The modification time of the
+# .npy file is bumped on every hit and used for least recently used eviction.
 
-    return (width, height, depth, float(ds.PixelSpacing[0]), float(ds.PixelSpacing[1]), float(ds.SliceThickness))
+# upper bound of the on-disk volume cache in bytes
+cacheLimit = 4 * 1024 ** 3
+
+# seconds after which the series index of a directory that was not imported again is deleted
+indexLifetime = 90 * 24 * 3600
+
+def cacheDirectory():
+    return bpy.utils.user_resource('DATAFILES', "volume_render_cache", create=True)
+
+
+def openSeriesIndex(dirName):
+    """the index of the dcm headers read by earlier imports of dirName, None if it cannot be opened
+
+    Each directory has its own index file, so an import only reads the
+    records of its own files. Records of deleted files are dropped, and
+    index files of directories that were not imported for indexLifetime
+    seconds are deleted.
+    """
+    directory = cacheDirectory()
+    now = time.time()
+    for name in os.listdir(directory):
+        if name.startswith('series_index_') and name.endswith('.sqlite') or name == 'series_index.sqlite':
+            try:
+                # the single index of earlier versions is deleted right away
+                if name == 'series_index.sqlite' or \
+                        now - os.stat(os.path.join(directory, name)).st_mtime > indexLifetime:
+                    os.remove(os.path.join(directory, name))
+            except OSError:
+                continue
+
+    folder = hashlib.sha1(os.path.abspath(dirName).encode('utf-8')).hexdigest()
+    path = os.path.join(directory, 'series_index_%s.sqlite' % folder)
+    try:
+        index = SeriesIndex(path)
+        index.prune()
+        # mark as recently used
+        os.utime(path, None)
+        return index
+    except Exception as error:
+        print('not using the series index: %s' % error)
+        return None
+
+
+def cacheKey(files, *parts):
+    """hash naming the volume built from files; it changes whenever one of them does"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+    for file_path in files:
+        stat = os.stat(file_path)
+        digest.update(('|%s|%d|%r' % (file_path, stat.st_size, stat.st_mtime)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cacheLoad(key):
+    """return the memory mapped volume and meta data stored for key, or None"""
+    path = os.path.join(cacheDirectory(), key)
+    try:
+        with open(path + '.json') as file:
+            info = json.load(file)
+        volume = numpy.load(path + '.npy', mmap_mode='r')
+        # mark as recently used
+        os.utime(path + '.npy', None)
+    except (IOError, OSError, ValueError):
+        return None
+
+    return volume, info
+
+
+def cacheCreate(key, shape, dtype):
+    """memory mapped file to write a volume into piece by piece, or None
+
+    Once written, cacheStore(key, None, info) adds it to the cache.
+    """
+    path = os.path.join(cacheDirectory(), key)
+    try:
+        return numpy.lib.format.open_memmap(path + '.tmp.npy', 'w+', dtype, shape)
+    except (IOError, OSError) as error:
+        print('could not cache volume: %s' % error)
+        return None
+
+
+def cacheStore(key, volume, info):
+    """store volume and info under key, volume is None for one written to cacheCreate"""
+    directory = cacheDirectory()
+    path = os.path.join(directory, key)
+    try:
+        with open(path + '.json', 'w') as file:
+            json.dump(info, file)
+        # write under a temporary name so a partial file is never mapped
+        if volume is not None:
+            numpy.save(path + '.tmp.npy', volume)
+        os.replace(path + '.tmp.npy', path + '.npy')
+    except (IOError, OSError) as error:
+        print('could not cache volume: %s' % error)
+        return
+
+    cacheEvict(directory, cacheLimit)
+
+
+def cachingSlabs(key, depth, slabs, info):
+    """pass (z, planes, buf) slabs through while writing them to the cache"""
+    stored = None
+    for z, planes, buf in slabs:
+        if z == 0:
+            stored = cacheCreate(key, (depth,) + planes.shape[1:], planes.dtype)
+        if stored is not None:
+            stored[z:z + len(planes)] = planes
+        yield z, planes, buf
+
+    if stored is not None:
+        stored.flush()
+        # unmap before the file is renamed
+        del stored
+        cacheStore(key, None, info)
+
+
+def cacheEvict(directory, limit):
+    """delete least recently used volumes until the cache fits into limit bytes"""
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith('.npy') and not name.endswith('.tmp.npy'):
+            stat = os.stat(os.path.join(directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, key in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(os.path.join(directory, key + '.npy'))
+            os.remove(os.path.join(directory, key + '.json'))
+        except OSError:
+            # still mapped on some platforms, try again next time
+            continue
+        total -= size
 
 
 def compileShader(source, shaderType):
@@ -1036,6 +1818,29 @@ def update_arc(self, context):
             vars.draw_handler = bpy.types.SpaceView3D.draw_handler_add(drawSlice, args, "WINDOW", "POST_PIXEL")
 
 
+def update_window(self, context):
+    if vars.volume_raw is None or vars.setting_window:
+        return
+
+    window = (self.windowCenter - self.windowWidth / 2.0, self.windowCenter + self.windowWidth / 2.0)
+    if vars.volume_window is not None:
+        # the properties only hold single precision floats
+        tolerance = 1e-5 * max(abs(window[0]), abs(window[1]), 1.0)
+        if max(abs(window[0] - vars.volume_window[0]), abs(window[1] - vars.volume_window[1])) < tolerance:
+            return
+
+    rewindowVolume(vars.volrender_texture[0], window)
+
+
+def showWindow(obj):
+    """set the window properties of obj to the current volume window, without re-quantizing"""
+    low, high = vars.volume_window
+    vars.setting_window = True
+    obj.windowWidth = high - low
+    obj.windowCenter = (low + high) / 2.0
+    vars.setting_window = False
+
+
 def initObjectProperties():
     bpy.types.Object.clip = BoolProperty(
         name = "Clip",
@@ -1128,6 +1933,19 @@ def initObjectProperties():
         min = 0.01,
         update=update_arc)
 
+    bpy.types.Object.windowCenter = FloatProperty(
+        name = "Window Center", 
+        description = "Rescaled value in the middle of the intensity window",
+        default = 0.0,
+        update=update_window)
+
+    bpy.types.Object.windowWidth = FloatProperty(
+        name = "Window Width", 
+        description = "Range of rescaled values spread over the intensity ramp",
+        default = 1.0,
+        min = 1e-6,
+        update=update_window)
+
 def initProperties(obj, context):
     update_azimuth(obj, context)
     update_elevation(obj, context)
@@ -1153,6 +1971,21 @@ def deleteProperties():
     del bpy.types.Object.sliceMode
     del bpy.types.Object.slicePos
     del bpy.types.Object.arc
+    del bpy.types.Object.windowCenter
+    del bpy.types.Object.windowWidth
+
+
+# texture precision of the volume importers, see precisionTypes
+precisionProperty = EnumProperty(
+        name="Precision",
+        items = [('AUTO', 'Auto', '8 or 16 bit, from the bit depth of the slices'),
+                 ('8', '8 Bit', 'R8 texture, 1 byte per voxel'),
+                 ('16', '16 Bit', 'R16 texture, 2 bytes per voxel'),
+                 ('HALF', 'Half Float', 'R16F texture, 2 bytes per voxel'),
+                 ('FLOAT', 'Float', 'R32F texture, 4 bytes per voxel'),
+                ],
+        default= 'AUTO',
+        )
 
 
 class ImportImageVolume(Operator, ImportHelper):
@@ -1182,14 +2015,23 @@ class ImportImageVolume(Operator, ImportHelper):
     # to the class instance from the operator settings before calling.
     max_slices = IntProperty(
             name="Max Slices",
-            description="will only import up to this many slices",
-            default= 500,
+            description="will only import up to this many slices, 0 imports all",
+            default= 0,
+            min= 0,
             )
     
     start_slice = IntProperty(
             name="Start Slice",
             description="will start with this slice",
             default= 0,
+            min= 0,
+            )
+
+    z_stride = IntProperty(
+            name="Slice Step",
+            description="will only import every n-th slice",
+            default= 1,
+            min= 1,
             )
 
     pix_width = FloatProperty(
@@ -1208,16 +2050,26 @@ class ImportImageVolume(Operator, ImportHelper):
             default= 1.0,
             )
 
+    precision = precisionProperty
+
+    use_cache = BoolProperty(
+            name="Use Cache",
+            description="reuse the volume stored by an earlier import of the same unchanged files",
+            default= True,
+            )
+
     def execute(self,context):
         print('loading texture')
  
         if vars.volrender_texture[0] == -1:
             glGenTextures(1, vars.volrender_texture)
 
-        volume = loadVolume(self.directory, self.files, vars.volrender_texture[0])
+        vars.volume_raw = None
+        volume = loadVolume(self.directory, self.files, vars.volrender_texture[0], self.precision, self.use_cache,
+                            self.start_slice, self.max_slices, self.z_stride)
         
         addCube(float(volume[0]), float(volume[1]), float(volume[2]),
-                self.pix_width, self.pix_height, self.slice_thickness)
+                self.pix_width, self.pix_height, self.slice_thickness * self.z_stride)
 
 
         #print('added a cube and succsesfully created 3d OpenGL texture from Image Stack')
@@ -1254,32 +2106,126 @@ class ImportDICOMVoulme(Operator, ImportHelper):
     # to the class instance from the operator settings before calling.
     max_slices = IntProperty(
             name="Max Slices",
-            description="will only import up to this many slices",
-            default= 500,
+            description="will only import up to this many slices, 0 imports all",
+            default= 0,
+            min= 0,
             )
     
     start_slice = IntProperty(
             name="Start Slice",
             description="will start with this slice",
             default= 0,
+            min= 0,
+            )
+
+    z_stride = IntProperty(
+            name="Slice Step",
+            description="will only import every n-th slice",
+            default= 1,
+            min= 1,
+            )
+
+    workers = IntProperty(
+            name="Workers",
+            description="number of slices decoded in parallel",
+            default= min(8, os.cpu_count() or 1),
+            min= 1,
+            )
+
+    window = EnumProperty(
+            name="Window",
+            items = [('FULL', 'Full Range', 'map the series minimum to maximum'),
+                     ('PERCENTILE', 'Percentile', 'map the 0.5 to 99.5 percentile of the series'),
+                     ('PRESET', 'DICOM Preset', 'use the stored WindowCenter/WindowWidth'),
+                    ],
+            default= 'FULL',
+            )
+
+    precision = precisionProperty
+
+    use_cache = BoolProperty(
+            name="Use Cache",
+            description="reuse the headers and volume stored by an earlier import of the same unchanged files",
+            default= True,
+            )
+
+    preview = EnumProperty(
+            name="Preview",
+            items = [('1', 'None', 'load the full resolution volume at once'),
+                     ('2', '2x', 'show a half resolution volume first, refine it in the background'),
+                     ('4', '4x', 'show a quarter resolution volume first, refine it in the background'),
+                    ],
+            default= '1',
             )
 
     def execute(self,context):
         if vars.volrender_texture[0] == -1:
             glGenTextures(1, vars.volrender_texture)
 
-        volume = loadDCMVolume(self.directory, self.files, vars.volrender_texture[0])
+        volume = loadDCMVolume(self.directory, self.files, vars.volrender_texture[0], self.workers, self.window,
+                               self.precision, self.use_cache, int(self.preview),
+                               self.start_slice, self.max_slices, self.z_stride)
 
         #if not 'VolCube' in context.scene.objects:
-        addCube(float(volume[0]), float(volume[1]), float(volume[2]),
-                volume[3], volume[4], volume[5])
+        cube, mat = addCube(float(volume[0]), float(volume[1]), float(volume[2]),
+                            volume[3], volume[4], volume[5])
+
+        # show the window used for the import, changing it re-quantizes the volume
+        showWindow(cube)
 
         #print('added a cube and succsesfully created 3d OpenGL texture from DICOM stack')
         #print('the image id as retuned by glGenTextures is %i' % volrender_texture[0])
+
+        if vars.volume_refine is not None:
+            # the refined volume gets its own window, shown on the cube
+            vars.volume_refine['object'] = cube.name
+            bpy.ops.volume_render.refine_volume('INVOKE_DEFAULT')
         
         return {'FINISHED'}
 
 
+class RefineVolume(Operator):
+    """Replaces the preview volume with the full resolution one while it is decoded"""
+    bl_idname = "volume_render.refine_volume"
+    bl_label = "Refine Volume"
+    bl_description = "Upload the full resolution volume slab by slab"
+
+    def invoke(self, context, event):
+        self._refine = vars.volume_refine
+        self._timer = context.window_manager.event_timer_add(0.05, context.window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        if vars.volume_refine is not self._refine:
+            # another volume was imported in the meantime
+            return self.finish(context, {'CANCELLED'})
+
+        if self._refine['error'] is not None:
+            print('could not refine volume: %s' % self._refine['error'])
+            vars.volume_refine = None
+            return self.finish(context, {'CANCELLED'})
+
+        done = refineStep(vars.volrender_texture[0], self._refine)
+        for area in context.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+        if done:
+            cube = bpy.data.objects.get(self._refine.get('object', ''))
+            if cube is not None:
+                showWindow(cube)
+            return self.finish(context, {'FINISHED'})
+        return {'PASS_THROUGH'}
+
+    def finish(self, context, result):
+        context.window_manager.event_timer_remove(self._timer)
+        return result
+
+
 class ShaderReplace(Operator):
     """Attaches volume texture and replaces shader of object"""
     bl_idname = "volume_render.replace_shader"  # important since its how bpy.ops.import_test.some_data is constructed
@@ -1328,6 +2274,9 @@ class UIPanel(bpy.types.Panel):
                 layout.prop(obj, 'clipPlaneDepth')
                 layout.prop(obj, 'clip')
                 layout.prop(obj, 'dither')
+                if vars.volume_raw is not None:
+                    layout.prop(obj, 'windowCenter')
+                    layout.prop(obj, 'windowWidth')
                 cr_node = scene.node_tree.nodes['VolColorRamp']
                 layout.template_color_ramp(cr_node, "color_ramp", expand=True)
                 layout.prop(obj, 'sliceMode')
@@ -1368,6 +2317,7 @@ def register():
     
     bpy.utils.register_class(ImportDICOMVoulme)
     bpy.utils.register_class(ImportImageVolume)
+    bpy.utils.register_class(RefineVolume)
     bpy.utils.register_class(ShaderReplace)
     bpy.utils.register_class(UIPanel)
 
@@ -1376,8 +2326,10 @@ def register():
 
 
 def unregister():
+    cancelRefine()
     bpy.utils.unregister_class(ImportDICOMVoulme)
     bpy.utils.unregister_class(ImportImageVolume)
+    bpy.utils.unregister_class(RefineVolume)
     bpy.utils.unregister_class(ShaderReplace)
     bpy.utils.unregister_class(UIPanel)
 
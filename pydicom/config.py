@@ -60,6 +60,20 @@ datetime_conversion = False
 datetime.date, datetime.datetime and datetime.time respectively. Default: False
 """
 
+pixel_data_mmap = False
+"""Set pixel_data_mmap to True to build pixel_array of uncompressed data
+without copying the pixel bytes: a PixelData value deferred by read_file's
+defer_size is memory mapped at its position in the file (copy-on-write, so
+the array is writable). A PixelData value that was read into memory is
+copied as usual. Default: False
+"""
+
+deferred_read_pool_size = 16
+"""Number of files kept open between reads of deferred data elements, see
+filereader.close_deferred_files. 0 opens and closes the file on every
+deferred read. Default: 16
+"""
+
 
 # Logging system and debug function to change logging level
 logger = logging.getLogger('pydicom')
@@ -41,11 +41,16 @@ from __future__ import print_function
 
 import os
 import time
-import gc
+import json
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
 
 import pydicom
 from pydicom.sequence import Sequence
 from pydicom import compat
+from pydicom.datadict import tag_for_name
+from pydicom.errors import InvalidDicomError
+from pydicom.filereader import read_tags
 
 # Try importing numpy
 try:
@@ -55,6 +60,21 @@ except ImportError:
     np = None  # NOQA
     have_numpy = False
 
+# sqlite3 can be missing from minimal Python builds
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+# os.scandir is new in Python 3.5, the scandir package backports it
+try:
+    from os import scandir as _scandir
+except ImportError:
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
+
 
 # Helper functions and classes
 class ProgressBar(object):
@@ -131,24 +151,491 @@ def _progressCallback(progress):
         _progressBar.Update(progress)
 
 
-def _listFiles(files, path):
-    """List all files in the directory, recursively. """
+def _listFiles(path):
+    """Yield all files in the directory, recursively. The files of a
+    directory come before those of its subdirectories, so they can be
+    read while the subdirectories are listed. """
+
+    directories = []
+    if _scandir is None:
+        for item in os.listdir(path):
+            item = os.path.join(path, item)
+            if os.path.isdir(item):
+                directories.append(item)
+            else:
+                yield item
+    else:
+        # scandir knows the type of most entries without a stat call per
+        # file, which matters most on network file systems
+        for entry in _scandir(path):
+            if entry.is_dir():
+                directories.append(entry.path)
+            else:
+                yield entry.path
+
+    for directory in directories:
+        for filename in _listFiles(directory):
+            yield filename
+
+
+def _mapFiles(function, files, workers=1):
+    """ Yield function(filename) for the given files, in order. With
+    more than one worker the files are processed by a pool of threads,
+    which hides the latency of opening and reading files; results are
+    yielded as soon as they are available in order. files may be an
+    iterator, such as _iterFiles: the pool takes the files from it while
+    it is walking the directories. """
+    if workers <= 1:
+        for filename in files:
+            yield function(filename)
+        return
+
+    pool = ThreadPool(workers)
+    try:
+        for result in pool.imap(function, files, chunksize=4):
+            yield result
+    finally:
+        pool.terminate()
+
+
+# The header fields needed to group, sort and scale the slices of a serie
+_headerKeywords = ('SeriesInstanceUID', 'InstanceNumber',
+                   'ImagePositionPatient', 'ImageOrientationPatient',
+                   'PixelSpacing', 'Rows', 'Columns', 'NumberOfFrames',
+                   'RescaleSlope', 'RescaleIntercept')
+_headerTags = [tag_for_name(keyword)
+               for keyword in _headerKeywords]
+
+# The header fields read_files reads from each file: those needed to
+# group, split, sort and rescale the slices of a serie. The complete
+# header of the first file is read by DicomSeries._finish, the pixel data
+# by _takePixelData.
+_seriesTags = _headerTags + [tag_for_name(keyword) for keyword in
+                             ('TriggerTime', 'SamplesPerPixel', 'BitsAllocated',
+                              'BitsStored', 'PixelRepresentation')]
+
+# Enhanced (multi-frame) images keep these per frame in functional groups
+_frameTags = _headerTags + [tag_for_name('SharedFunctionalGroupsSequence'),
+                            tag_for_name('PerFrameFunctionalGroupsSequence')]
+
+SliceHeader = namedtuple('SliceHeader',
+                         'filename suid instance position orientation '
+                         'spacing rows columns slope intercept frames frame')
+
+
+def _tupleOfFloats(value):
+    """ Convert a multi-valued DS element to a tuple of floats, or
+    None if it is missing. """
+    if value is None:
+        return None
+    return tuple(float(v) for v in value)
+
+
+def _sliceHeader(filename, ds):
+    """ Make the SliceHeader of a dataset read by read_tags, or None
+    if it is not an image. """
+    if 'Rows' not in ds or 'SeriesInstanceUID' not in ds:
+        return None
+
+    instance = ds.get('InstanceNumber')
+    frames = ds.get('NumberOfFrames')
+    slope = ds.get('RescaleSlope')
+    intercept = ds.get('RescaleIntercept')
+    return SliceHeader(
+        filename, str(ds.SeriesInstanceUID),
+        None if instance in (None, '') else int(instance),
+        _tupleOfFloats(ds.get('ImagePositionPatient')),
+        _tupleOfFloats(ds.get('ImageOrientationPatient')),
+        _tupleOfFloats(ds.get('PixelSpacing')),
+        int(ds.Rows), int(ds.Columns),
+        1.0 if slope in (None, '') else float(slope),
+        0.0 if intercept in (None, '') else float(intercept),
+        1 if frames in (None, '') else int(frames), None)
+
+
+def scan_file(filename, force=False):
+    """ scan_file(filename, force=False)
+    Read only the header fields needed to sort a file into a serie,
+    stopping before the pixel data. Returns a SliceHeader, or None if
+    the file is not a DICOM image. For a multi-frame file the header
+    holds the number of frames, see scan_frames.
+    """
+    try:
+        ds = read_tags(filename, _headerTags, force=force)
+    except (InvalidDicomError, EOFError, IOError):
+        return None
+    return _sliceHeader(filename, ds)
+
+
+def _frameValue(groups, sequence, keyword):
+    """ Get a value from the first of the functional groups that
+    contains it, or None. """
+    for group in groups:
+        if sequence in group:
+            items = group.data_element(sequence).value
+            if len(items) and keyword in items[0]:
+                return getattr(items[0], keyword)
+    return None
+
+
+def scan_frames(filename, force=False):
+    """ scan_frames(filename, force=False)
+    Read the header fields of every frame of a multi-frame (enhanced)
+    file. The position, orientation, spacing and rescale of each frame
+    come from its per-frame functional groups or the shared ones, and
+    fall back to the top level elements. Returns a list of SliceHeader
+    instances with the frame index set, or None if the file is not a
+    DICOM image.
+    """
+    try:
+        ds = read_tags(filename, _frameTags, force=force)
+    except (InvalidDicomError, EOFError, IOError):
+        return None
+    header = _sliceHeader(filename, ds)
+    if header is None:
+        return None
+
+    shared = ds.get('SharedFunctionalGroupsSequence') or []
+    perFrame = ds.get('PerFrameFunctionalGroupsSequence') or []
+
+    headers = []
+    for frame in range(header.frames):
+        groups = list(perFrame[frame:frame + 1]) + list(shared[:1])
+        position = _frameValue(groups, 'PlanePositionSequence',
+                               'ImagePositionPatient')
+        orientation = _frameValue(groups, 'PlaneOrientationSequence',
+                                  'ImageOrientationPatient')
+        spacing = _frameValue(groups, 'PixelMeasuresSequence',
+                              'PixelSpacing')
+        slope = _frameValue(groups, 'PixelValueTransformationSequence',
+                            'RescaleSlope')
+        intercept = _frameValue(groups, 'PixelValueTransformationSequence',
+                                'RescaleIntercept')
+        headers.append(header._replace(
+            frame=frame,
+            position=_tupleOfFloats(position) or header.position,
+            orientation=_tupleOfFloats(orientation) or header.orientation,
+            spacing=_tupleOfFloats(spacing) or header.spacing,
+            slope=header.slope if slope is None else float(slope),
+            intercept=header.intercept if intercept is None else float(intercept)))
+    return headers
+
+
+def scan_files(path, force=False, workers=4):
+    """ scan_files(path, force=False, workers=4)
+    Scan the headers of all files in the given directory (recursively)
+    or list of files, with a pool of the given number of threads.
+    Returns a list of SliceHeader instances for the files that could be
+    read, in the order found.
+    """
+    files = _iterFiles(path)
+    headers = _mapFiles(lambda filename: scan_file(filename, force), files, workers)
+    return [header for header in headers if header is not None]
+
+
+def _iterFiles(path):
+    """ Get an iterator over the files for read_files or scan_files from
+    a directory name, file name or list of file names. The directories
+    are walked as the files are taken, so reading them can start before
+    the walk is done. """
 
-    for item in os.listdir(path):
-        item = os.path.join(path, item)
-        if os.path.isdir(item):
-            _listFiles(files, item)
+    if isinstance(path, compat.string_types):
+        # Make dir nice
+        basedir = os.path.abspath(path)
+        # Check whether it exists
+        if not os.path.isdir(basedir):
+            raise ValueError('The given path is not a valid directory.')
+        # Find files recursively
+        return _listFiles(basedir)
+
+    elif isinstance(path, (tuple, list)):
+        return _iterPaths(path)
+    else:
+        raise ValueError('The path argument must be a string or list.')
+
+
+def _iterPaths(paths):
+    # Iterate over all elements, which can be files or directories
+    for p in paths:
+        if os.path.isdir(p):
+            for filename in _listFiles(os.path.abspath(p)):
+                yield filename
+        elif os.path.isfile(p):
+            yield p
         else:
-            files.append(item)
+            print("Warning, the path '%s' is not valid." % p)
+
+
+def _collectFiles(path):
+    """ Get the list of files for read_files or scan_files from a
+    directory name, file name or list of file names. """
+    return list(_iterFiles(path))
+
 
+class SeriesIndex(object):
+    """ SeriesIndex(database)
+    A persistent index of the SliceHeader of DICOM files, stored in an
+    SQLite database file, e.g. next to the data. Each file is recorded
+    with its size and modification time, so that update() and refresh()
+    only read the headers of files that are new or changed since they
+    were indexed. Files that are not DICOM images are recorded too, so
+    they are not read again either. prune() forgets the files that were
+    removed.
 
-def _splitSerieIfRequired(serie, series):
-    """ _splitSerieIfRequired(serie, series)
-    Split the serie in multiple series if this is required.
-    The choice is based on examing the image position relative to
-    the previous image. If it differs too much, it is assumed
-    that there is a new dataset. This can happen for example in
-    unspitted gated CT data.
+    For a folder that receives new files all day:
+
+        index = SeriesIndex(os.path.join(folder, 'series.sqlite'))
+        changed = index.refresh(folder)  # the SeriesInstanceUIDs affected
+        for suid in changed:
+            series = index.dicom_series(suid)
+    """
+
+    # increase when the stored records change, older databases are rebuilt
+    _version = 1
+
+    # paths per query, below the limit of 999 SQLite parameters
+    _chunk = 500
+
+    def __init__(self, database):
+        if sqlite3 is None:
+            raise ImportError("The sqlite3 module is required to use SeriesIndex.")
+        self._database = os.path.abspath(database)
+        self._connection = sqlite3.connect(database)
+        version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+        with self._connection:
+            if version != self._version:
+                self._connection.execute('DROP TABLE IF EXISTS files')
+                self._connection.execute('PRAGMA user_version = %d' % self._version)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS files ('
+                                     'path TEXT PRIMARY KEY, size INTEGER, mtime REAL, '
+                                     'suid TEXT, header TEXT)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS files_suid ON files (suid)')
+
+    def close(self):
+        """ Close the database. """
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def update(self, files, force=False, workers=4):
+        """ update(files, force=False, workers=4)
+        Bring the records of the given files up to date, reading the
+        headers of new or changed files with a pool of the given number
+        of threads. Returns the set of SeriesInstanceUIDs whose files
+        changed.
+        """
+        files = list(files)
+        stored = dict((path, (size, mtime, suid)) for path, size, mtime, suid in
+                      self._select('path, size, mtime, suid', files))
+        changed = []
+        for filename in files:
+            if os.path.abspath(filename).startswith(self._database):
+                continue  # the database and its journal
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            record = stored.get(filename)
+            if record is None or record[:2] != (stat.st_size, stat.st_mtime):
+                changed.append((filename, stat.st_size, stat.st_mtime))
+        if not changed:
+            return set()
+
+        affected = set(stored[filename][2] for filename, _, _ in changed if filename in stored)
+        headers = _mapFiles(lambda filename: scan_file(filename, force),
+                            [filename for filename, _, _ in changed], workers)
+        rows = []
+        for (filename, size, mtime), header in zip(changed, headers):
+            if header is None:
+                rows.append((filename, size, mtime, None, None))
+            else:
+                affected.add(header.suid)
+                rows.append((filename, size, mtime, header.suid, json.dumps(header[1:])))
+        with self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', rows)
+        affected.discard(None)
+        return affected
+
+    def refresh(self, path, force=False, workers=4):
+        """ refresh(path, force=False, workers=4)
+        Update the index for all files in the given directory (recursively)
+        or list of files, and forget the files in it that were removed.
+        Returns the set of SeriesInstanceUIDs whose files changed.
+        """
+        files = _collectFiles(path)
+        affected = self.update(files, force, workers)
+
+        if isinstance(path, compat.string_types):
+            roots = [os.path.abspath(path)]
+        else:
+            roots = [os.path.abspath(p) for p in path if os.path.isdir(p)]
+        present = set(files)
+        removed = [(filename, suid) for filename, suid in
+                   self._connection.execute('SELECT path, suid FROM files')
+                   if filename not in present and
+                   any(filename.startswith(os.path.join(root, '')) for root in roots)]
+        if removed:
+            with self._connection:
+                self._connection.executemany('DELETE FROM files WHERE path = ?',
+                                             [(filename,) for filename, _ in removed])
+            affected.update(suid for _, suid in removed if suid is not None)
+        return affected
+
+    def prune(self):
+        """ Forget the files that no longer exist. Returns the set of
+        SeriesInstanceUIDs whose files were removed.
+        """
+        removed = [(filename, suid) for filename, suid in
+                   self._connection.execute('SELECT path, suid FROM files')
+                   if not os.path.isfile(filename)]
+        if removed:
+            with self._connection:
+                self._connection.executemany('DELETE FROM files WHERE path = ?',
+                                             [(filename,) for filename, _ in removed])
+        return set(suid for _, suid in removed if suid is not None)
+
+    def series(self):
+        """ Return a dict of the number of indexed files per
+        SeriesInstanceUID. """
+        return dict(self._connection.execute(
+            'SELECT suid, COUNT(*) FROM files WHERE suid IS NOT NULL GROUP BY suid'))
+
+    def headers(self, files=None, suid=None):
+        """ headers(files=None, suid=None)
+        Return the SliceHeader instances of the given files (in their
+        order, skipping files that are not indexed DICOM images), or
+        those of a serie, or all of them.
+        """
+        if files is not None:
+            files = list(files)
+            records = dict((filename, header) for filename, header in
+                           self._select('path, header', files) if header is not None)
+            pairs = [(filename, records[filename]) for filename in files if filename in records]
+        elif suid is not None:
+            pairs = self._connection.execute(
+                'SELECT path, header FROM files WHERE suid = ? ORDER BY path', (suid,)).fetchall()
+        else:
+            pairs = self._connection.execute(
+                'SELECT path, header FROM files WHERE header IS NOT NULL ORDER BY path').fetchall()
+        return [self._header(filename, header) for filename, header in pairs]
+
+    def dicom_series(self, suid, showProgress=False, workers=4):
+        """ dicom_series(suid, showProgress=False, workers=4)
+        Read the files of a serie with read_files, which returns a list
+        of DicomSeries (more than one if the serie needs to be split).
+        """
+        files = [header.filename for header in self.headers(suid=suid)]
+        if not files:
+            return []
+        return read_files(files, showProgress, workers=workers)
+
+    def _select(self, columns, files):
+        """ The given columns of the records of files, queried in chunks
+        of paths instead of reading the whole table. """
+        for start in range(0, len(files), self._chunk):
+            chunk = files[start:start + self._chunk]
+            for row in self._connection.execute(
+                    'SELECT %s FROM files WHERE path IN (%s)' % (columns, ', '.join('?' * len(chunk))),
+                    chunk):
+                yield row
+
+    @staticmethod
+    def _header(filename, header):
+        fields = [tuple(value) if isinstance(value, list) else value
+                  for value in json.loads(header)]
+        return SliceHeader(filename, *fields)
+
+
+def _sliceNormal(orientation):
+    """ The normal of the image plane, i.e. the cross product of the row
+    and column direction cosines of ImageOrientationPatient. """
+    r0, r1, r2, c0, c1, c2 = orientation
+    return (r1 * c2 - r2 * c1, r2 * c0 - r0 * c2, r0 * c1 - r1 * c0)
+
+
+def _slicePosition(position, normal):
+    """ The location of an image along the slice normal. """
+    return sum(p * n for p, n in zip(position, normal))
+
+
+def order_slices(headers, tolerance=0.1):
+    """ order_slices(headers, tolerance=0.1)
+    Sort SliceHeader instances along the normal of the slices, by
+    projecting ImagePositionPatient on it. Slices without position or
+    orientation are sorted by InstanceNumber instead.
+
+    Returns a tuple (headers, spacing, gaps, duplicates). The spacing is
+    the median distance between subsequent slices (None if it cannot be
+    measured). Gaps is a list of the indices of the slices after which a
+    distance of more than 1.5 times the spacing occurs. Slices at the same
+    location as the previous one (within tolerance times the spacing) are
+    left out of the sorted list and returned as duplicates.
+    """
+    if not headers:
+        return [], None, [], []
+    orientation = headers[0].orientation
+    if orientation is None or any(h.position is None for h in headers):
+        headers = sorted(headers, key=lambda h: h.instance or 0)
+        return headers, None, [], []
+
+    normal = _sliceNormal(orientation)
+    located = sorted(((_slicePosition(h.position, normal), h)
+                      for h in headers), key=lambda lh: lh[0])
+    distances = [b[0] - a[0] for a, b in zip(located[:-1], located[1:])]
+    measured = sorted(d for d in distances if d > 0)
+    if not measured:
+        return [h for _, h in located[:1]], None, [], \
+            [h for _, h in located[1:]]
+    spacing = measured[len(measured) // 2]
+
+    ordered, gaps, duplicates = [located[0][1]], [], []
+    for distance, (_, h) in zip(distances, located[1:]):
+        if distance < tolerance * spacing:
+            duplicates.append(h)
+            continue
+        if distance > 1.5 * spacing:
+            gaps.append(len(ordered) - 1)
+        ordered.append(h)
+    return ordered, spacing, gaps, duplicates
+
+
+def _datasetPosition(ds):
+    """ The location of a dataset along its slice normal, or its z
+    position if it has no ImageOrientationPatient. """
+    if "ImageOrientationPatient" in ds:
+        normal = _sliceNormal([float(v) for v in ds.ImageOrientationPatient])
+        return _slicePosition([float(v) for v in ds.ImagePositionPatient],
+                              normal)
+    return float(ds.ImagePositionPatient[2])
+
+
+def _spacingOf(distances):
+    """ The most common distance between subsequent slices, from a
+    histogram of the distances at 0.01 mm resolution, ignoring slices
+    at the same location. None if there are no such distances. """
+    distances = np.round(distances[distances > 0.01], 2)
+    if not len(distances):
+        return None
+    values, counts = np.unique(distances, return_counts=True)
+    return float(values[np.argmax(counts)])
+
+
+def _phaseKey(ds):
+    """ Order of the slices at one location of a gated serie. """
+    return float(ds.get('TriggerTime', 0) or 0), int(ds.get('InstanceNumber', 0) or 0)
+
+
+def _splitSerieByDistance(serie):
+    """ _splitSerieByDistance(serie)
+    Sort the serie, and split it where the distance to the previous
+    slice is more than 2.1 times the distance seen before. This is the
+    slice by slice fallback of _splitSerie when numpy is not available;
+    gated series are not split into phases.
+    Returns the list of series.
     """
 
     # Sort the original list and get local name
@@ -160,7 +647,7 @@ def _splitSerieIfRequired(serie, series):
 
     # Check whether we can do this
     if "ImagePositionPatient" not in ds1:
-        return
+        return [serie]
 
     # Initialize a list of new lists
     L2 = [[ds1]]
@@ -179,7 +666,6 @@ def _splitSerieIfRequired(serie, series):
 
         # Get distances
         newDist = abs(pos1 - pos2)
-        # deltaDist = abs(firstPos-pos2)
 
         # If the distance deviates more than 2x from what we've seen,
         # we can agree it's a new dataset.
@@ -199,22 +685,86 @@ def _splitSerieIfRequired(serie, series):
         ds1 = ds2
 
     # Split if we should
-    if len(L2) > 1:
-
-        # At what position are we now?
-        i = series.index(serie)
-
-        # Create new series
-        series2insert = []
-        for L in L2:
-            newSerie = DicomSeries(serie.suid, serie._showProgress)
-            newSerie._datasets = Sequence(L)
-            series2insert.append(newSerie)
-
-        # Insert series and remove self
-        for newSerie in reversed(series2insert):
-            series.insert(i, newSerie)
-        series.remove(serie)
+    if len(L2) == 1:
+        return [serie]
+    parts = []
+    for L in L2:
+        newSerie = DicomSeries(serie.suid, serie._showProgress)
+        newSerie._datasets = Sequence(L)
+        parts.append(newSerie)
+    return parts
+
+
+def _splitSerie(serie, tolerance=0.1):
+    """ _splitSerie(serie, tolerance=0.1)
+    Sort the serie, and split it in multiple series if this is required.
+    Returns the list of series.
+
+    The choice is based on the positions of the slices along the slice
+    normal, compared at once as an array:
+      * if every location holds the same number of slices (within
+        tolerance times the slice spacing), the serie is gated or
+        multi-phase; it is split into one serie per phase, by the
+        order of TriggerTime and InstanceNumber at each location.
+      * a distance of more than 2.1 times the spacing (the most common
+        distance) between subsequent slices is assumed to start a new
+        dataset. This can happen for example in unsplitted gated CT data.
+      * a distance of more than 1.5 times the spacing is reported as
+        a missing file.
+    """
+    datasets = serie._datasets
+    if not have_numpy:
+        return _splitSerieByDistance(serie)
+    if len(datasets) < 2 or \
+            not all("ImagePositionPatient" in ds for ds in datasets):
+        serie._sort()
+        return [serie]
+
+    # Sort by position along the slice normal (stable, like _sort)
+    positions = np.array([_datasetPosition(ds) for ds in datasets])
+    order = np.argsort(positions, kind='mergesort')
+    positions = positions[order]
+    datasets = [datasets[i] for i in order]
+    distances = np.diff(positions)
+    spacing = _spacingOf(distances)
+    if spacing is None:
+        serie._datasets = Sequence(datasets)
+        return [serie]
+
+    # Locations, and the number of slices at each of them
+    starts = np.flatnonzero(np.concatenate([[True], distances >= tolerance * spacing]))
+    counts = np.diff(np.append(starts, len(datasets)))
+    if counts.max() > 1:
+        if counts.min() == counts.max():
+            # gated: split into phases, each gets one slice per location
+            phases = counts[0]
+            keys = [_phaseKey(ds) for ds in datasets]
+            order = np.lexsort((np.array([k[1] for k in keys]), np.array([k[0] for k in keys]),
+                                np.repeat(np.arange(len(starts)), counts)))
+            byPhase = order.reshape(len(starts), phases).T
+            parts = []
+            for phase in byPhase:
+                part = DicomSeries(serie.suid, serie._showProgress)
+                part._datasets = Sequence([datasets[i] for i in phase])
+                parts.extend(_splitSerie(part, tolerance))
+            return parts
+        print('Warning: %d slices share their location with another slice'
+              % (counts.sum() - len(counts)))
+
+    # Split at jumps in position, warn about missing files
+    splits = np.flatnonzero(distances > 2.1 * spacing) + 1
+    for index in np.flatnonzero((distances > 1.5 * spacing) & (distances <= 2.1 * spacing)):
+        print('Warning: missing file after "%s"' % datasets[index].filename)
+    if not len(splits):
+        serie._datasets = Sequence(datasets)
+        return [serie]
+
+    parts = []
+    for begin, end in zip(np.append(0, splits), np.append(splits, len(datasets))):
+        part = DicomSeries(serie.suid, serie._showProgress)
+        part._datasets = Sequence(datasets[begin:end])
+        parts.append(part)
+    return parts
 
 
 pixelDataTag = pydicom.tag.Tag(0x7fe0, 0x0010)
@@ -226,15 +776,8 @@ def _getPixelDataFromDataset(ds):
     preserved. Also applies RescaleSlope and RescaleIntercept
     if available. """
 
-    # Get original element
-    el = dict.__getitem__(ds, pixelDataTag)
-
     # Get data
-    data = ds.pixel_array
-
-    # Remove data (mark as deferred)
-    dict.__setitem__(ds, pixelDataTag, el)
-    del ds._pixel_array
+    data = _takePixelData(ds)
 
     # Obtain slope and offset
     slope = 1
@@ -302,10 +845,120 @@ def _getPixelDataFromDataset(ds):
     return data
 
 
+def _rescaleOf(ds):
+    """ Get the RescaleSlope and RescaleIntercept of a dataset, as ints
+    when they are integral, and whether they need floats. """
+    slope = ds.get('RescaleSlope', 1)
+    offset = ds.get('RescaleIntercept', 0)
+    if int(slope) != slope or int(offset) != offset:
+        return float(slope), float(offset), True
+    return int(slope), int(offset), False
+
+
+def _integerDtype(minReq, maxReq):
+    """ Get the smallest integer datatype that holds the given range,
+    float32 if none does. """
+    if minReq < 0:
+        maxReq = max([-minReq - 1, maxReq])
+        for dtype in (np.int8, np.int16, np.int32):
+            if maxReq < 2 ** (8 * np.dtype(dtype).itemsize - 1):
+                return dtype
+    else:
+        for dtype in (np.uint8, np.uint16, np.uint32):
+            if maxReq < 2 ** (8 * np.dtype(dtype).itemsize):
+                return dtype
+    return np.float32
+
+
+def _requiredRange(ds, low, high):
+    """ Get the (min, max) that a datatype must hold to rescale the stored
+    values low to high of the dataset in it: the stored values, the slope
+    and the intercept fit the datatype too, so the data can be rescaled
+    in place. """
+    slope, offset, needFloats = _rescaleOf(ds)
+    values = [low, high, low * slope, high * slope,
+              low * slope + offset, high * slope + offset, slope, offset]
+    return min(values), max(values)
+
+
+def _seriesDtype(datasets):
+    """ Get the datatype that holds the rescaled data of all the datasets.
+    The stored values follow from BitsStored and PixelRepresentation,
+    which is an upper bound of the actual data. """
+    minReq = maxReq = 0
+    for ds in datasets:
+        if _rescaleOf(ds)[2]:
+            return np.float32
+        bits = ds.get('BitsStored', ds.BitsAllocated)
+        if ds.get('PixelRepresentation', 0):
+            low, high = _requiredRange(ds, -2 ** (bits - 1), 2 ** (bits - 1) - 1)
+        else:
+            low, high = _requiredRange(ds, 0, 2 ** bits - 1)
+        minReq, maxReq = min(minReq, low), max(maxReq, high)
+    return _integerDtype(minReq, maxReq)
+
+
+def _readHeader(filename, force=False):
+    """ Read the header fields of a file that read_files needs, see
+    _seriesTags. """
+    ds = read_tags(filename, _seriesTags, force=force)
+    ds.filename = filename
+    ds.header_only = True
+    return ds
+
+
+def _completeHeader(ds):
+    """ Get the complete header of a dataset, reading it from the file
+    for datasets of _readHeader. """
+    if getattr(ds, 'header_only', False):
+        return pydicom.read_file(ds.filename, stop_before_pixels=True, force=True)
+    return ds
+
+
+def _takePixelData(ds):
+    """ Get the stored pixel data of the given dataset, not rescaled.
+    If the data was deferred, make it deferred again, so that memory is
+    preserved. Datasets of _readHeader read the pixel data from their
+    file. """
+
+    if getattr(ds, 'header_only', False):
+        return pydicom.read_file(ds.filename, force=True).pixel_array
+
+    # Get original element
+    el = dict.__getitem__(ds, pixelDataTag)
+
+    # Get data
+    data = ds.pixel_array
+
+    # Remove data (mark as deferred)
+    dict.__setitem__(ds, pixelDataTag, el)
+    del ds._pixel_array
+    return data
+
+
+def _readPixelDataInto(ds, plane):
+    """ Decode the pixel data of the given dataset straight into plane,
+    applying RescaleSlope and RescaleIntercept in place. If the data was
+    deferred, make it deferred again, so that memory is preserved. """
+    _rescaleInto(ds, _takePixelData(ds), plane)
+
+
+def _rescaleInto(ds, data, plane):
+    """ Copy the stored pixel data of the given dataset to plane, applying
+    RescaleSlope and RescaleIntercept in the plane's datatype. """
+    slope, offset, needFloats = _rescaleOf(ds)
+    if slope != 1:
+        np.multiply(data, slope, out=plane, dtype=plane.dtype, casting='unsafe')
+    else:
+        np.copyto(plane, data, casting='unsafe')
+    if offset != 0:
+        np.add(plane, offset, out=plane, dtype=plane.dtype, casting='unsafe')
+
+
 # The public functions and classes
 
-def read_files(path, showProgress=False, readPixelData=False, force=False):
-    """ read_files(path, showProgress=False, readPixelData=False)
+def read_files(path, showProgress=False, readPixelData=False, force=False, workers=4):
+    """ read_files(path, showProgress=False, readPixelData=False, force=False, workers=4)
 
     Reads dicom files and returns a list of DicomSeries objects, which
     contain information about the data, and can be used to load the
@@ -321,35 +974,26 @@ def read_files(path, showProgress=False, readPixelData=False, force=False):
     to stdout. By default, no progress is shown.
 
     if readPixelData is True, the pixel data of all series is read. By
-    default the loading of pixeldata is deferred until it is requested
-    using the DicomSeries.get_pixel_array() method. In general, both
-    methods should be equally fast.
+    default only the header fields needed to group and sort the files
+    are read, and the pixel data is read when it is requested using the
+    DicomSeries.get_pixel_array() method.
+
+    The files are read by a pool of "workers" threads while the
+    directories are walked, and grouped into series as they are read.
+    Splitting and sorting the series happens once all files are read.
+    Progress is relative to the number of files found so far.
     """
 
-    # Init list of files
-    files = []
-
-    # Obtain data from the given path
-    if isinstance(path, compat.string_types):
-        # Make dir nice
-        basedir = os.path.abspath(path)
-        # Check whether it exists
-        if not os.path.isdir(basedir):
-            raise ValueError('The given path is not a valid directory.')
-        # Find files recursively
-        _listFiles(files, basedir)
+    # Iterate over the files while the directories are walked, skipping
+    # DICOMDIR files; the files found so far are counted for the progress
+    files = _iterFiles(path)
+    found = []
 
-    elif isinstance(path, (tuple, list)):
-        # Iterate over all elements, which can be files or directories
-        for p in path:
-            if os.path.isdir(p):
-                _listFiles(files, os.path.abspath(p))
-            elif os.path.isfile(p):
-                files.append(p)
-            else:
-                print("Warning, the path '%s' is not valid." % p)
-    else:
-        raise ValueError('The path argument must be a string or list.')
+    def collect():
+        for filename in files:
+            if not filename.count("DICOMDIR"):
+                found.append(filename)
+                yield filename
 
     # Set default progress callback?
     if showProgress is True:
@@ -357,31 +1001,28 @@ def read_files(path, showProgress=False, readPixelData=False, force=False):
     if not hasattr(showProgress, '__call__'):
         showProgress = _dummyProgressCallback
 
-    # Set defer size
-    deferSize = 16383  # 128**2-1
-    if readPixelData:
-        deferSize = None
+    def readFile(filename):
+        # Try loading dicom, return the dataset or the reason it failed
+        try:
+            if readPixelData:
+                return pydicom.read_file(filename, force=force)
+            return _readHeader(filename, force)
+        except Exception as why:
+            return why
 
     # Gather file data and put in DicomSeries
     series = {}
     count = 0
     showProgress('Loading series information:')
-    for filename in files:
-
-        # Skip DICOMDIR files
-        if filename.count("DICOMDIR"):
-            continue
+    for dcm in _mapFiles(readFile, collect(), workers):
 
-        # Try loading dicom ...
-        try:
-            dcm = pydicom.read_file(filename, deferSize, force=force)
-        except pydicom.filereader.InvalidDicomError:
+        if isinstance(dcm, InvalidDicomError):
             continue  # skip non-dicom file
-        except Exception as why:
+        elif isinstance(dcm, Exception):
             if showProgress is _progressCallback:
-                _progressBar.PrintMessage(str(why))
+                _progressBar.PrintMessage(str(dcm))
             else:
-                print('Warning:', why)
+                print('Warning:', dcm)
             continue
 
         # Get SUID and register the file with an existing or new series object
@@ -394,7 +1035,7 @@ def read_files(path, showProgress=False, readPixelData=False, force=False):
         series[suid]._append(dcm)
 
         # Show progress (note that we always start with a 0.0)
-        showProgress(float(count) / len(files))
+        showProgress(float(count) / len(found))
         count += 1
 
     # Finish progress
@@ -405,8 +1046,7 @@ def read_files(path, showProgress=False, readPixelData=False, force=False):
     series.sort(key=lambda x: x.suid)
 
     # Split series if necessary
-    for serie in reversed([serie for serie in series]):
-        _splitSerieIfRequired(serie, series)
+    series = [part for serie in series for part in _splitSerie(serie)]
 
     # Finish all series
     showProgress('Analysing series')
@@ -540,29 +1180,88 @@ class DicomSeries(object):
 
         # Set callback to update progress
         showProgress = self._showProgress
-
-        # Init data (using what the dicom packaged produces as a reference)
-        ds = self._datasets[0]
-        slice = _getPixelDataFromDataset(ds)
-        # vol = Aarray(self.shape, self.sampling, fill=0, dtype=slice.dtype)
-        vol = np.zeros(self.shape, dtype=slice.dtype)
-        vol[0] = slice
-
-        # Fill volume
         showProgress('Loading data:')
-        ll = self.shape[0]
-        for z in range(1, ll):
-            ds = self._datasets[z]
-            vol[z] = _getPixelDataFromDataset(ds)
-            showProgress(float(z) / ll)
+
+        if any(_rescaleOf(ds)[2] for ds in self._datasets):
+            # Float rescale, decode straight into the float volume
+            vol = np.empty(self.shape, dtype=np.float32)
+            for progress in self.iter_pixel_array(vol):
+                showProgress(progress)
+        else:
+            vol = self._read_rescaled_volume(showProgress)
 
         # Finish
         showProgress(None)
 
         # Done
-        gc.collect()
         return vol
 
+    def _read_rescaled_volume(self, showProgress):
+        """ _read_rescaled_volume(showProgress)
+
+        Decode every slice once and rescale it straight into its plane of
+        a volume of the smallest datatype that holds the rescaled data,
+        e.g. int16 for CT with an intercept of -1024, where the header
+        based get_pixel_dtype() allows int32. The datatype follows the
+        range of the slices decoded so far; when a slice needs a wider
+        one, only the planes before it are copied, which happens at most
+        once per wider datatype.
+        """
+
+        vol = None
+        minReq = maxReq = 0
+        ll = len(self._datasets)
+        for z, ds in enumerate(self._datasets):
+            data = _takePixelData(ds)
+            low, high = _requiredRange(ds, int(data.min()), int(data.max()))
+            minReq, maxReq = min(minReq, low), max(maxReq, high)
+            dtype = np.dtype(_integerDtype(minReq, maxReq))
+            if vol is None:
+                vol = np.empty(self.shape, dtype=dtype)
+            elif dtype != vol.dtype:
+                wider = np.empty(self.shape, dtype=dtype)
+                wider[:z] = vol[:z]
+                vol = wider
+            _rescaleInto(ds, data, vol[z])
+            showProgress(float(z + 1) / ll)
+        return vol
+
+    def get_pixel_dtype(self):
+        """ get_pixel_dtype()
+
+        Get a data type that holds the rescaled data of all slices, for
+        iter_pixel_array(). It is determined from the headers, without
+        reading pixel data, so it holds every value that BitsStored
+        allows. get_pixel_array() uses the range of the actual data
+        instead, which may give a smaller type.
+        """
+        if not have_numpy:
+            msg = "The Numpy package is required to use get_pixel_dtype.\n"
+            raise ImportError(msg)
+        return np.dtype(_seriesDtype(self._datasets))
+
+    def iter_pixel_array(self, vol):
+        """ iter_pixel_array(vol)
+
+        Load the data of this serie into vol, a numpy array of the
+        serie's shape, e.g. created with get_pixel_dtype(). This is a
+        generator: each slice is decoded straight into its plane of vol
+        and rescaled in place, after which the fraction of slices loaded
+        so far is yielded.
+        """
+
+        # Check info
+        if self.info is None:
+            raise RuntimeError("Cannot return volume if series not finished.")
+        if tuple(vol.shape) != tuple(self.shape):
+            raise ValueError('Volume of shape %s does not match serie of shape %s'
+                             % (tuple(vol.shape), tuple(self.shape)))
+
+        ll = len(self._datasets)
+        for z in range(ll):
+            _readPixelDataInto(self._datasets[z], vol[z])
+            yield float(z + 1) / ll
+
     def _append(self, dcm):
         """ _append(dcm)
         Append a dicomfile (as a pydicom.dataset.FileDataset) to the series.
@@ -571,9 +1270,13 @@ class DicomSeries(object):
 
     def _sort(self):
         """ sort()
-        Sort the datasets by instance number.
+        Sort the datasets by their location along the slice normal,
+        or by instance number if they have no position.
         """
-        self._datasets.sort(key=lambda k: k.InstanceNumber)
+        if all("ImagePositionPatient" in ds for ds in self._datasets):
+            self._datasets.sort(key=_datasetPosition)
+        else:
+            self._datasets.sort(key=lambda k: k.InstanceNumber)
 
     def _finish(self):
         """ _finish()
@@ -591,14 +1294,14 @@ class DicomSeries(object):
 
         """
 
-        # The datasets list should be sorted by instance number
+        # The datasets list should be sorted by location
         L = self._datasets
         if len(L) == 0:
             return
         elif len(L) < 2:
             # Set attributes
             ds = self._datasets[0]
-            self._info = self._datasets[0]
+            self._info = _completeHeader(ds)
             self._shape = [ds.Rows, ds.Columns]
             self._sampling = [float(ds.PixelSpacing[0]), float(ds.PixelSpacing[1])]
             return
@@ -621,8 +1324,8 @@ class DicomSeries(object):
             ds2 = L[index]
 
             # Get positions
-            pos1 = float(ds1.ImagePositionPatient[2])
-            pos2 = float(ds2.ImagePositionPatient[2])
+            pos1 = _datasetPosition(ds1)
+            pos2 = _datasetPosition(ds2)
 
             # Update distance_sum to calculate distance later
             distance_sum += abs(pos1 - pos2)
@@ -645,7 +1348,7 @@ class DicomSeries(object):
 
         # Create new dataset by making a deep copy of the first
         info = pydicom.dataset.Dataset()
-        firstDs = self._datasets[0]
+        firstDs = _completeHeader(self._datasets[0])
         for key in firstDs.keys():
             if key != (0x7fe0, 0x0010):
                 el = firstDs[key]
@@ -9,22 +9,30 @@
 #
 
 from pydicom.config import logger
-from pydicom.tag import Tag
+from pydicom.tag import Tag, BaseTag
 from pydicom._dicom_dict import DicomDictionary  # the actual dict of {tag: (VR, VM, name, is_retired, keyword), ...}
 from pydicom._dicom_dict import RepeatersDictionary  # those with tags like "(50xx, 0005)"
-from pydicom._private_dict import private_dictionaries
 import warnings
 from pydicom.compat import in_py2
 
-# Generate mask dict for checking repeating groups etc.
+# The tables below that are not needed to read a file are built on first
+# use, so that importing pydicom stays cheap: the repeater masks, the old
+# style names (NameDict) and the private dictionaries.
+
+# Mask dict for checking repeating groups etc., see _build_masks.
 # Map a true bitwise mask to the DICOM mask with "x"'s in it.
 masks = {}
-for mask_x in RepeatersDictionary:
-    # mask1 is XOR'd to see that all non-"x" bits are identical (XOR result = 0 if bits same)
-    #      then AND those out with 0 bits at the "x" ("we don't care") location using mask2
-    mask1 = int(mask_x.replace("x", "0"), 16)
-    mask2 = int("".join(["F0"[c == "x"] for c in mask_x]), 16)
-    masks[mask_x] = (mask1, mask2)
+
+
+def _build_masks():
+    built = {}
+    for mask_x in RepeatersDictionary:
+        # mask1 is XOR'd to see that all non-"x" bits are identical (XOR result = 0 if bits same)
+        #      then AND those out with 0 bits at the "x" ("we don't care") location using mask2
+        mask1 = int(mask_x.replace("x", "0"), 16)
+        mask2 = int("".join(["F0"[c == "x"] for c in mask_x]), 16)
+        built[mask_x] = (mask1, mask2)
+    masks.update(built)  # all at once, other threads never see part of the masks
 
 # For shorter naming of dicom member elements, put an entry here
 #   (longer naming can also still be used)
@@ -37,7 +45,38 @@ shortNames = [
 ]
 
 
+# Memoized lookups, see get_entry and tag_for_name. Each cache is cleared
+# when it reaches lookup_cache_size entries, which bounds it for datasets
+# with many distinct private or repeater tags. Both are also cleared when
+# entries are added to the tables they come from (as in
+# examples/add_dict_entries.py), so that no cached miss outlives them.
+lookup_cache_size = 4096
+_repeater_cache = {}  # tag -> RepeatersDictionary key, or None
+_name_cache = {}  # non-keyword name -> tag, or None
+_cached_table_sizes = None
+
+
+def _cache_store(cache, key, value):
+    if len(cache) >= lookup_cache_size:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def _check_caches():
+    global _cached_table_sizes
+    sizes = (len(DicomDictionary), len(RepeatersDictionary), len(keyword_dict), len(NameDict))
+    if sizes != _cached_table_sizes:
+        if masks and len(masks) != len(RepeatersDictionary):
+            _build_masks()
+        _repeater_cache.clear()
+        _name_cache.clear()
+        _cached_table_sizes = sizes
+
+
 def mask_match(tag):
+    if not masks:
+        _build_masks()
     for mask_x, (mask1, mask2) in masks.items():
         if (tag ^ mask1) & mask2 == 0:
             return mask_x
@@ -54,7 +93,11 @@ def get_entry(tag):
     try:
         return DicomDictionary[tag]
     except KeyError:
-        mask_x = mask_match(tag)
+        _check_caches()
+        try:
+            mask_x = _repeater_cache[tag]
+        except KeyError:
+            mask_x = _cache_store(_repeater_cache, tag, mask_match(tag))
         if mask_x:
             return RepeatersDictionary[mask_x]
         else:
@@ -151,9 +194,23 @@ def CleanName(tag):
     return s
 
 # Provide for the 'reverse' lookup. Given clean name, what is the tag?
-logger.debug("Reversing DICOM dictionary so can look up tag from a name...")
-NameDict = dict([(CleanName(tag), tag) for tag in DicomDictionary])
-keyword_dict = dict([(dictionary_keyword(tag), tag) for tag in DicomDictionary])
+# NameDict is filled on first use by tag_for_name (see name_dict); entries
+# added to it before that are kept.
+NameDict = {}
+_name_dict_filled = False
+keyword_dict = dict([(entry[4], BaseTag(tag)) for tag, entry in DicomDictionary.items()])
+
+
+def name_dict():
+    """Return NameDict, the old style pydicom names -> tags, filling it first if needed."""
+    global _name_dict_filled
+    if not _name_dict_filled:
+        logger.debug("Reversing DICOM dictionary so can look up tag from a name...")
+        names = dict([(CleanName(tag), tag) for tag in DicomDictionary])
+        names.update(NameDict)
+        NameDict.update(names)  # all at once, as for masks
+        _name_dict_filled = True
+    return NameDict
 
 
 def short_name(name):
@@ -183,11 +240,21 @@ def long_name(name):
 
 def tag_for_name(name):
     """Return the dicom tag corresponding to name, or None if none exist."""
-    if name in keyword_dict:  # the usual case
-        return keyword_dict[name]
+    try:
+        return keyword_dict[name]  # the usual case
+    except KeyError:
+        pass
+    # Misses (e.g. python attributes looked up on a Dataset) and short
+    # names are memoized; deprecated names are not, so they keep warning
+    _check_caches()
+    try:
+        return _name_cache[name]
+    except KeyError:
+        pass
     # If not an official keyword, check the old style pydicom names
-    if name in NameDict:
-        tag = NameDict[name]
+    names = name_dict()
+    if name in names:
+        tag = names[name]
         msg = ("'%s' as tag name has been deprecated; use official DICOM keyword '%s'"
                % (name, dictionary_keyword(tag)))
         warnings.warn(msg, DeprecationWarning)
@@ -196,8 +263,8 @@ def tag_for_name(name):
     # check if is short-form of a valid name
     longname = long_name(name)
     if longname:
-        return NameDict.get(longname, None)
-    return None
+        return _cache_store(_name_cache, name, names.get(longname, None))
+    return _cache_store(_name_cache, name, None)
 
 
 def all_names_for_tag(tag):
@@ -212,11 +279,21 @@ def all_names_for_tag(tag):
 
 # PRIVATE DICTIONARY handling
 # functions in analogy with those of main DICOM dict
+def _private_dictionaries():
+    """Return the private dictionaries, importing them on first use"""
+    global private_dictionaries
+    try:
+        return private_dictionaries
+    except NameError:
+        from pydicom._private_dict import private_dictionaries
+        return private_dictionaries
+
+
 def get_private_entry(tag, private_creator):
     """Return the tuple (VR, VM, name, is_retired) from a private dictionary"""
     tag = Tag(tag)
     try:
-        private_dict = private_dictionaries[private_creator]
+        private_dict = _private_dictionaries()[private_creator]
     except KeyError:
         raise KeyError("Private creator {0} not in private dictionary".format(private_creator))
 
@@ -97,6 +97,11 @@ class DataElement(object):
     VM : int
         The Value Multiplicity of the Data Element's stored value(s)
     """
+    # no per instance __dict__: large headers hold many thousands of elements
+    # private_creator is only set for private tags, by Dataset.__setitem__
+    __slots__ = ('tag', 'VR', '_value', 'file_tell', 'is_undefined_length',
+                 'private_creator')
+
     descripWidth = 35
     maxBytesToDisplay = 16
     showVR = 1
@@ -131,6 +136,22 @@ class DataElement(object):
         self.file_tell = file_value_tell
         self.is_undefined_length = is_undefined_length
 
+    def _slot_names(self):
+        """Names of the slots of this element's class and its bases"""
+        return [name for cls in type(self).__mro__
+                for name in getattr(cls, '__slots__', ())]
+
+    def __getstate__(self):
+        # needed by pickle protocols 0 and 1, which do not handle __slots__
+        state = dict(getattr(self, '__dict__', {}))  # subclasses without __slots__
+        state.update((name, getattr(self, name)) for name in self._slot_names()
+                     if hasattr(self, name))
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     @property
     def value(self):
         """The value (possibly multiple values) of this data_element"""
@@ -300,6 +321,9 @@ class DataElement(object):
 
 class DeferredDataElement(DataElement):
     """Subclass of DataElement where value is not read into memory until needed"""
+    __slots__ = ('fp_is_implicit_VR', 'fp_is_little_endian', 'filepath',
+                 'file_mtime', 'data_element_tell', 'length')
+
     def __init__(self, tag, VR, fp, file_mtime, data_element_tell, length):
         """Store basic info for the data element but value will be read later
 
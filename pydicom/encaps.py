@@ -15,11 +15,29 @@
 # First item is an Offset Table. It can have 0 length and no value, or it can have a table of US pointers to first byte of the Item tag starting each *Frame*,
 #    where 0 of pointer is at first Item tag following the Offset table
 # If a single frame, it may be 0 length/no value, or it may have a single pointer (0).
+from bisect import bisect_right
+from struct import Struct
+
 from pydicom.config import logger
 
 from pydicom.filebase import DicomBytesIO
 from pydicom.tag import ItemTag, SequenceDelimiterTag
 
+# Transfer Syntax UID -> decoder of a single compressed frame.
+# A decoder is called as decoder(fragments, dataset), with the list of the
+# byte strings of the frame's fragments, and returns the frame's pixels as a
+# flat numpy array in the order of uncompressed Pixel Data.
+frame_decoders = {}
+
+
+def register_frame_decoder(transfer_syntax, decoder):
+    """Use decoder for the pixel data of the given transfer syntax.
+
+    See ``frame_decoders`` for the decoder signature. A decoder registered
+    for a transfer syntax replaces any earlier one.
+    """
+    frame_decoders[transfer_syntax] = decoder
+
 
 def defragment_data(data):
     """Read encapsulated data and return one continuous string
@@ -69,3 +87,86 @@ def read_item(fp):
         raise ValueError("Encapsulated data fragment had Undefined Length at data position 0x%x" % fp.tell() - 4)
     item_data = fp.read(length)
     return item_data
+
+
+_item_header = Struct("<HHL")
+
+# start of a JPEG or JPEG 2000 codestream, which starts a new frame
+_frame_markers = (b'\xff\xd8', b'\xff\x4f\xff\x51')
+
+
+def get_frame_index(data, number_of_frames=1):
+    """Return where the fragments of every frame are in encapsulated data.
+
+    Parameters
+    ----------
+    data : bytes
+        Encapsulated data, typically dataset.PixelData
+    number_of_frames : int
+        The NumberOfFrames of the dataset
+
+    Returns
+    -------
+    list
+        A list with one list per frame of the (start, end) positions of its
+        fragments in data, so data[start:end] is a fragment.
+
+    Frames start at the offsets of the Basic Offset Table. If that is
+    empty, every fragment is a frame when there are as many fragments as
+    frames, all fragments are one frame when there is a single frame, and
+    otherwise a new frame starts at every fragment that starts a JPEG or
+    JPEG 2000 codestream.
+
+    Raises
+    ------
+    ValueError
+        If the frames cannot be told apart.
+    """
+    group, elem, length = _item_header.unpack_from(data, 0)
+    if (group, elem) != (0xfffe, 0xe000):
+        raise ValueError("Encapsulated data does not start with the Basic Offset Table")
+    offsets = Struct("<%dL" % (length // 4)).unpack_from(data, 8)
+
+    # (offset from the first fragment item, start, end) of every fragment
+    first = 8 + length
+    fragments = []
+    pos = first
+    while pos + 8 <= len(data):
+        group, elem, length = _item_header.unpack_from(data, pos)
+        if (group, elem) == (0xfffe, 0xe0dd):  # Sequence Delimiter
+            break
+        if (group, elem) != (0xfffe, 0xe000):
+            logger.warning("Expected Item with tag %s at data position 0x%x", ItemTag, pos)
+        if length == 0xFFFFFFFF:
+            raise ValueError("Encapsulated data fragment had Undefined Length at data position 0x%x" % pos)
+        fragments.append((pos - first, pos + 8, pos + 8 + length))
+        pos += 8 + length
+
+    if offsets:
+        frames = [[] for offset in offsets]
+        for offset, start, end in fragments:
+            frames[bisect_right(offsets, offset) - 1].append((start, end))
+        return frames
+
+    if len(fragments) == number_of_frames:
+        return [[(start, end)] for offset, start, end in fragments]
+    if number_of_frames == 1:
+        return [[(start, end) for offset, start, end in fragments]]
+
+    frames = []
+    for offset, start, end in fragments:
+        if not frames or data[start:start + 4].startswith(_frame_markers):
+            frames.append([])
+        frames[-1].append((start, end))
+    if len(frames) != number_of_frames:
+        raise ValueError("Found %d frames in encapsulated data, expected %d" %
+                         (len(frames), number_of_frames))
+    return frames
+
+
+def get_frame_fragments(data, frame_index, frame):
+    """Return the fragments of one frame as a list of byte strings.
+
+    frame_index is the result of get_frame_index for data.
+    """
+    return [data[start:end] for start, end in frame_index[frame]]
@@ -7,11 +7,13 @@
 from __future__ import absolute_import
 # Need zlib and io.BytesIO for deflate-compressed file
 import os.path
+import threading
 import warnings
+from collections import OrderedDict
 import zlib
 from io import BytesIO
 
-from pydicom.tag import TupleTag
+from pydicom.tag import Tag, TupleTag
 from pydicom.dataelem import RawDataElement
 from pydicom.util.hexutil import bytes2hex
 from pydicom.valuerep import extra_length_VRs
@@ -751,6 +753,84 @@ def read_file(fp, defer_size=None, stop_before_pixels=False, force=False):
     return dataset
 
 
+def read_tags(fp, tags, force=False):
+    """Read only the given data elements of a DICOM file.
+
+    Meant for quickly going through many files, e.g. to group and sort
+    the slices of a series. Parsing stops at the pixel data, or as soon as
+    the elements following the last requested tag are reached, and large
+    values of other elements are skipped over instead of read.
+
+    Parameters
+    ----------
+    fp : file-like object, str
+        Either a file-like object, or a string containing the file name.
+        If a file-like object, the caller is responsible for closing it.
+    tags : sequence
+        The tags to read, in any form accepted by ``Tag``.
+    force : boolean, optional
+        See ``read_file`` for parameter info.
+
+    Returns
+    -------
+    Dataset
+        A dataset containing only those of the requested elements that are
+        present in the file. Values are converted when accessed.
+    """
+    caller_owns_file = True
+    if isinstance(fp, compat.string_types):
+        caller_owns_file = False
+        fp = open(fp, 'rb')
+
+    tags = frozenset(Tag(tag) for tag in tags)
+    last_tag = max(tags)
+
+    def stop_when(tag, VR, length):
+        return tag > last_tag or tag == (0x7fe0, 0x0010)
+
+    try:
+        preamble = read_preamble(fp, force)
+        transfer_syntax = None
+        if preamble is not None:
+            file_meta = _read_file_meta_info(fp)
+            transfer_syntax = file_meta.get("TransferSyntaxUID")
+        if transfer_syntax is None or \
+                transfer_syntax == pydicom.uid.DeflatedExplicitVRLittleEndian:
+            # let read_partial work out or decompress the transfer syntax
+            fp.seek(0)
+            dataset = read_partial(fp, stop_when, force=force)
+            return Dataset(dict((tag, dict.__getitem__(dataset, tag))
+                                for tag in tags if tag in dataset))
+
+        is_implicit_VR = (transfer_syntax == pydicom.uid.ImplicitVRLittleEndian)
+        is_little_endian = (transfer_syntax != pydicom.uid.ExplicitVRBigEndian)
+        raw_data_elements = dict()
+        de_gen = data_element_generator(fp, is_implicit_VR, is_little_endian,
+                                        stop_when, defer_size=_read_tags_defer_size)
+        try:
+            for raw_data_element in de_gen:
+                if raw_data_element.tag in tags:
+                    if raw_data_element.value is None:
+                        # larger than the defer size -- read it now
+                        fp_save = fp.tell()
+                        fp.seek(raw_data_element.value_tell)
+                        raw_data_element = raw_data_element._replace(
+                            value=fp.read(raw_data_element.length))
+                        fp.seek(fp_save)
+                    raw_data_elements[raw_data_element.tag] = raw_data_element
+        except EOFError as details:
+            logger.error(str(details) + " in file " +
+                         getattr(fp, "name", "<no filename>"))
+    finally:
+        if not caller_owns_file:
+            fp.close()
+
+    return Dataset(raw_data_elements)
+
+# read_tags skips over (rather than reads) values larger than this
+_read_tags_defer_size = 256
+
+
 def read_dicomdir(filename="DICOMDIR"):
     """Read a DICOMDIR file and return a DicomDir instance.
 
@@ -793,6 +873,56 @@ def data_element_offset_to_value(is_implicit_VR, VR):
     return offset
 
 
+# Files kept open for deferred reads, least recently used first:
+# (fileobj_type, filename) -> (modification time, open file).
+# A file is taken out of the pool while it is read, so that no two threads
+# share a file position and eviction never closes a file in use.
+_deferred_files = OrderedDict()
+_deferred_files_lock = threading.Lock()
+
+
+def _checkout_deferred_file(fileobj_type, filename, mtime):
+    """Return an open file for a deferred read, from the pool if possible"""
+    key = (fileobj_type, filename)
+    with _deferred_files_lock:
+        pooled = _deferred_files.pop(key, None)
+    if pooled is not None:
+        if pooled[0] == mtime:
+            return pooled[1]
+        pooled[1].close()  # the file changed since it was opened
+    return fileobj_type(filename, 'rb')
+
+
+def _return_deferred_file(fileobj_type, filename, mtime, fp):
+    """Put a file back into the pool, closing the least recently used ones"""
+    closing = []
+    with _deferred_files_lock:
+        key = (fileobj_type, filename)
+        if mtime is None or key in _deferred_files or config.deferred_read_pool_size <= 0:
+            closing.append(fp)
+        else:
+            _deferred_files[key] = (mtime, fp)
+        while len(_deferred_files) > max(config.deferred_read_pool_size, 0):
+            closing.append(_deferred_files.popitem(last=False)[1][1])
+    for fp in closing:
+        fp.close()
+
+
+def close_deferred_files(filename=None):
+    """Close the files kept open for reading deferred data elements.
+
+    Parameters
+    ----------
+    filename : str, None
+        Close only the files of this name; None closes all of them.
+    """
+    with _deferred_files_lock:
+        keys = [key for key in _deferred_files if filename is None or key[1] == filename]
+        closing = [_deferred_files.pop(key)[1] for key in keys]
+    for fp in closing:
+        fp.close()
+
+
 def read_deferred_data_element(fileobj_type, filename, timestamp,
                                raw_data_elem):
     """Read the previously deferred value from the file into memory
@@ -806,25 +936,30 @@ def read_deferred_data_element(fileobj_type, filename, timestamp,
     if not os.path.exists(filename):
         raise IOError(u"Deferred read -- original file "
                       "{0:s} is missing".format(filename))
-    if stat_available and (timestamp is not None):
-        statinfo = stat(filename)
-        if statinfo.st_mtime != timestamp:
+    mtime = None
+    if stat_available:
+        mtime = stat(filename).st_mtime
+        if timestamp is not None and mtime != timestamp:
             warnings.warn("Deferred read warning -- file modification time "
                           "has changed.")
 
-    # Open the file, position to the right place
-    # fp = self.typefileobj(self.filename, "rb")
-    fp = fileobj_type(filename, 'rb')
-    is_implicit_VR = raw_data_elem.is_implicit_VR
-    is_little_endian = raw_data_elem.is_little_endian
-    offset = data_element_offset_to_value(is_implicit_VR, raw_data_elem.VR)
-    fp.seek(raw_data_elem.value_tell - offset)
-    elem_gen = data_element_generator(fp, is_implicit_VR, is_little_endian,
-                                      defer_size=None)
-
-    # Read the data element and check matches what was stored before
-    data_elem = next(elem_gen)
-    fp.close()
+    # Take an open file from the pool (keyed by name and modification
+    # time, see close_deferred_files), position to the right place
+    fp = _checkout_deferred_file(fileobj_type, filename, mtime)
+    try:
+        is_implicit_VR = raw_data_elem.is_implicit_VR
+        is_little_endian = raw_data_elem.is_little_endian
+        offset = data_element_offset_to_value(is_implicit_VR, raw_data_elem.VR)
+        fp.seek(raw_data_elem.value_tell - offset)
+        elem_gen = data_element_generator(fp, is_implicit_VR, is_little_endian,
+                                          defer_size=None)
+
+        # Read the data element and check matches what was stored before
+        data_elem = next(elem_gen)
+    except:
+        fp.close()
+        raise
+    _return_deferred_file(fileobj_type, filename, mtime, fp)
     if data_elem.VR != raw_data_elem.VR:
         raise ValueError("Deferred read VR {0:s} does not match "
                          "original {1:s}".format(data_elem.VR, raw_data_elem.VR))
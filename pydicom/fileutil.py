@@ -5,6 +5,7 @@
 #    See the file license.txt included with this distribution, also
 #    available at https://github.com/darcymason/pydicom
 
+import mmap
 from struct import pack, unpack
 from pydicom.tag import TupleTag, Tag
 from pydicom.datadict import dictionary_description
@@ -33,7 +34,86 @@ def absorb_delimiter_item(fp, is_little_endian, delimiter):
         logger.debug("%04x: Expected 0x00000000 after delimiter, found 0x%x", fp.tell() - 4, length)
 
 
-def find_bytes(fp, bytes_to_find, read_size=128, rewind=True):
+# Bytes read at a time when searching a file that cannot be memory mapped
+search_read_size = 1024 * 1024
+
+
+def _file_map(fp):
+    """Return a read-only memory map of the file underlying fp, or None.
+
+    File-like objects without a file descriptor (BytesIO, gzip streams),
+    empty files and files that cannot be mapped give None.
+    """
+    parent = getattr(fp, 'parent', fp)
+    try:
+        fileno = parent.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+    try:
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError, OverflowError):
+        return None
+
+
+def _search(fp, bytes_to_find, read_size, max_value=None):
+    """Find bytes_to_find at or after the current position of fp.
+
+    The file is memory mapped and searched with a single find when it can
+    be, else it is read in windows of read_size bytes, overlapping by
+    len(bytes_to_find) - 1 bytes kept in memory, so no seeking is needed.
+
+    Returns
+    -------
+    found_at, value : int or None, bytes or None
+        found_at is the position of the match, None if the end of the file
+        is reached first. value holds the bytes from the start position to
+        the match, if found and not longer than max_value (None: no limit).
+        The file position afterwards is unspecified.
+    """
+    data_start = fp.tell()
+    mapped = _file_map(fp)
+    if mapped is not None:
+        try:
+            found_at = mapped.find(bytes_to_find, data_start)
+            if found_at == -1:
+                return None, None
+            if max_value is not None and found_at - data_start > max_value:
+                return found_at, None
+            return found_at, mapped[data_start:found_at]
+        finally:
+            mapped.close()
+
+    read = getattr(fp, 'parent_read', fp.read)  # no EOFError on a short last window
+    overlap = len(bytes_to_find) - 1
+    window_start = data_start
+    tail = b""
+    chunks = []
+    byte_count = 0
+    while True:
+        bytes_read = read(max(read_size, overlap + 1))
+        if not bytes_read:
+            return None, None
+        window = tail + bytes_read
+        index = window.find(bytes_to_find)
+        if index != -1:
+            byte_count += index
+            if chunks is None or (max_value is not None and byte_count > max_value):
+                return window_start + index, None
+            chunks.append(window[:index])
+            return window_start + index, b"".join(chunks)
+        # keep the end of the window, in case the bytes cross into the next one
+        keep = max(len(window) - overlap, 0)
+        tail = window[keep:]
+        window_start += keep
+        byte_count += keep
+        if chunks is not None:
+            if max_value is not None and byte_count > max_value:
+                chunks = None
+            else:
+                chunks.append(window[:keep])
+
+
+def find_bytes(fp, bytes_to_find, read_size=search_read_size, rewind=True):
     """Read in the file until a specific byte sequence found.
 
     Parameters
@@ -42,7 +122,7 @@ def find_bytes(fp, bytes_to_find, read_size=128, rewind=True):
         Contains the bytes to find. Must be in correct
         endian order already.
     read_size : int
-        Number of bytes to read at a time.
+        Number of bytes to read at a time, if the file cannot be memory mapped.
     rewind : boolean
         Flag to rewind file reading position.
 
@@ -51,41 +131,19 @@ def find_bytes(fp, bytes_to_find, read_size=128, rewind=True):
     found_at : byte, None
         Position where byte sequence was found, else None.
     """
-
     data_start = fp.tell()
-    search_rewind = len(bytes_to_find) - 1
-
-    found = False
-    EOF = False
-    while not found:
-        chunk_start = fp.tell()
-        bytes_read = fp.read(read_size)
-        if len(bytes_read) < read_size:
-            # try again - if still don't get required amount, this is last block
-            new_bytes = fp.read(read_size - len(bytes_read))
-            bytes_read += new_bytes
-            if len(bytes_read) < read_size:
-                EOF = True  # but will still check whatever we did get
-        index = bytes_read.find(bytes_to_find)
-        if index != -1:
-            found = True
-        elif EOF:
-            if rewind:
-                fp.seek(data_start)
-            return None
-        else:
-            fp.seek(fp.tell() - search_rewind)  # rewind a bit in case delimiter crossed read_size boundary
-    # if get here then have found the byte string
-    found_at = chunk_start + index
+    found_at, _ = _search(fp, bytes_to_find, read_size, max_value=0)
     if rewind:
         fp.seek(data_start)
+    elif found_at is None:
+        fp.seek(0, 2)
     else:
         fp.seek(found_at + len(bytes_to_find))
     return found_at
 
 
 def read_undefined_length_value(fp, is_little_endian, delimiter_tag, defer_size=None,
-                                read_size=128):
+                                read_size=search_read_size):
     """Read until the delimiter tag found and return the value; ignore the delimiter.
 
     On completion, the file will be set to the first byte after the delimiter and its
@@ -97,7 +155,7 @@ def read_undefined_length_value(fp, is_little_endian, delimiter_tag, defer_size=
     is_little_endian : boolean
         True if file transfer syntax is little endian, else False.
     read_size : int
-        Number of bytes to read at one time.
+        Number of bytes to read at one time, if the file cannot be memory mapped.
 
     Returns
     -------
@@ -110,7 +168,6 @@ def read_undefined_length_value(fp, is_little_endian, delimiter_tag, defer_size=
         If EOF is reached before delimiter found.
     """
     data_start = fp.tell()
-    search_rewind = 3
 
     if is_little_endian:
         bytes_format = b"<HH"
@@ -118,49 +175,22 @@ def read_undefined_length_value(fp, is_little_endian, delimiter_tag, defer_size=
         bytes_format = b">HH"
     bytes_to_find = pack(bytes_format, delimiter_tag.group, delimiter_tag.elem)
 
-    found = False
-    EOF = False
-    value_chunks = []
-    byte_count = 0  # for defer_size checks
-    while not found:
-        chunk_start = fp.tell()
-        bytes_read = fp.read(read_size)
-        if len(bytes_read) < read_size:
-            # try again - if still don't get required amount, this is last block
-            new_bytes = fp.read(read_size - len(bytes_read))
-            bytes_read += new_bytes
-            if len(bytes_read) < read_size:
-                EOF = True  # but will still check whatever we did get
-        index = bytes_read.find(bytes_to_find)
-        if index != -1:
-            found = True
-            new_bytes = bytes_read[:index]
-            byte_count += len(new_bytes)
-            if defer_size is None or byte_count < defer_size:
-                value_chunks.append(bytes_read[:index])
-            fp.seek(chunk_start + index + 4)  # rewind to end of delimiter
-            length = fp.read(4)
-            if length != b"\0\0\0\0":
-                msg = "Expected 4 zero bytes after undefined length delimiter at pos {0:04x}"
-                logger.error(msg.format(fp.tell() - 4))
-        elif EOF:
-            fp.seek(data_start)
-            raise EOFError("End of file reached before delimiter {0!r} found".format(delimiter_tag))
-        else:
-            fp.seek(fp.tell() - search_rewind)  # rewind a bit in case delimiter crossed read_size boundary
-            # accumulate the bytes read (not including the rewind)
-            new_bytes = bytes_read[:-search_rewind]
-            byte_count += len(new_bytes)
-            if defer_size is None or byte_count < defer_size:
-                value_chunks.append(new_bytes)
-    # if get here then have found the byte string
-    if defer_size is not None and defer_size >= defer_size:
-        return None
-    else:
-        return b"".join(value_chunks)
+    # a value of defer_size bytes or more is not kept (it is read later on demand)
+    max_value = None if defer_size is None else defer_size - 1
+    found_at, value = _search(fp, bytes_to_find, read_size, max_value)
+    if found_at is None:
+        fp.seek(data_start)
+        raise EOFError("End of file reached before delimiter {0!r} found".format(delimiter_tag))
+
+    fp.seek(found_at + 4)  # end of delimiter
+    length = fp.read(4)
+    if length != b"\0\0\0\0":
+        msg = "Expected 4 zero bytes after undefined length delimiter at pos {0:04x}"
+        logger.error(msg.format(fp.tell() - 4))
+    return value
 
 
-def find_delimiter(fp, delimiter, is_little_endian, read_size=128, rewind=True):
+def find_delimiter(fp, delimiter, is_little_endian, read_size=search_read_size, rewind=True):
     """Return file position where 4-byte delimiter is located.
 
     Parameters
@@ -185,7 +215,8 @@ def find_delimiter(fp, delimiter, is_little_endian, read_size=128, rewind=True):
     return find_bytes(fp, bytes_to_find, read_size=read_size, rewind=rewind)
 
 
-def length_of_undefined_length(fp, delimiter, is_little_endian, read_size=128, rewind=True):
+def length_of_undefined_length(fp, delimiter, is_little_endian, read_size=search_read_size,
+                               rewind=True):
     """Search through the file to find the delimiter and return the length of the data
     element.
 
@@ -210,7 +241,7 @@ def length_of_undefined_length(fp, delimiter, is_little_endian, read_size=128, r
     routine must handle that. Delimiter must be 4 bytes long.
     """
     data_start = fp.tell()
-    delimiter_pos = find_delimiter(fp, delimiter, is_little_endian, rewind=rewind)
+    delimiter_pos = find_delimiter(fp, delimiter, is_little_endian, read_size=read_size, rewind=rewind)
     length = delimiter_pos - data_start
     return length
 
@@ -0,0 +1,109 @@
+# rle.py
+"""Decoder for RLE Lossless compressed pixel data (PS 3.5 Annex G)
+
+Registered with encaps.register_frame_decoder on import, so that
+Dataset.pixel_array and Dataset.get_frame handle RLE Lossless files
+without GDCM.
+"""
+# Copyright (c) 2008-2012 Darcy Mason
+# This file is part of pydicom, released under a modified MIT license.
+#    See the file license.txt included with this distribution, also
+#    available at https://github.com/darcymason/pydicom
+
+# A compressed frame starts with a 64 byte header of 16 little endian
+# unsigned longs: the number of segments (at most 15) and the offset of
+# each segment from the start of the header.
+# There is one segment per byte of each sample, the most significant byte
+# first, for sample after sample. Each segment is a PackBits stream:
+#    control byte n in 0..127 -> copy the next n + 1 bytes literally
+#    control byte n in 129..255 -> repeat the next byte 257 - n times
+#    control byte 128 -> no operation
+
+import numpy
+
+from pydicom import encaps
+from pydicom.uid import RLELossless
+
+
+# control byte -> distance to the next control byte
+_advance = [n + 2 for n in range(128)] + [1] + [2] * 127
+
+
+def unpack_bits(data, length):
+    """Decode one PackBits segment into a numpy uint8 array of length bytes.
+
+    Only locating the control bytes needs a loop over the runs; how often
+    each byte of data is output is then computed with numpy and the runs
+    are expanded with a single numpy.repeat.
+    Missing bytes at the end of a short segment are zero.
+    """
+    control = bytearray(data)
+    size = len(control)
+    advance = _advance
+    positions = []
+    append = positions.append
+    pos = 0
+    while pos < size:
+        append(pos)
+        pos += advance[control[pos]]
+
+    decoded = numpy.zeros(length, numpy.uint8)
+    if not positions:
+        return decoded
+    src = numpy.frombuffer(data, numpy.uint8)
+    positions = numpy.array(positions, numpy.intp)
+    n = src[positions].astype(numpy.intp)
+    starts = positions + 1
+    literal = (n < 128) & (starts < size)
+    replicated = (n > 128) & (starts < size)
+
+    # number of times every byte of data is output: once inside a literal
+    # run (marked by a running sum of run starts and ends), 257 - n times
+    # for the byte of a replicated run and never for control bytes
+    marks = numpy.zeros(size + 1, numpy.intp)
+    marks[starts[literal]] += 1
+    marks[numpy.minimum(starts[literal] + n[literal] + 1, size)] -= 1
+    repeats = numpy.cumsum(marks[:size])
+    repeats[starts[replicated]] = 257 - n[replicated]
+
+    output = numpy.repeat(src, repeats)[:length]
+    decoded[:len(output)] = output
+    return decoded
+
+
+def decode_frame(fragments, dataset):
+    """Decode the fragments of one RLE Lossless frame (see encaps.frame_decoders)
+
+    Returns the frame's pixels as a flat array, samples interleaved or by
+    plane following the dataset's PlanarConfiguration.
+    """
+    data = b''.join(fragments)
+    header = numpy.frombuffer(data[:64], '<u4')
+    if len(header) != 16:
+        raise ValueError("RLE frame is too short for its header: %d bytes" % len(data))
+
+    pixels = dataset.Rows * dataset.Columns
+    samples = dataset.get('SamplesPerPixel', 1)
+    width = dataset.BitsAllocated // 8
+    number_of_segments = int(header[0])
+    if number_of_segments != samples * width:
+        raise ValueError("RLE frame has %d segments, expected %d for %d samples of %d bits"
+                         % (number_of_segments, samples * width, samples, dataset.BitsAllocated))
+
+    offsets = [int(offset) for offset in header[1:number_of_segments + 1]] + [len(data)]
+    # (samples, most to least significant byte, pixels)
+    planes = numpy.empty((number_of_segments, pixels), numpy.uint8)
+    for segment in range(number_of_segments):
+        planes[segment] = unpack_bits(data[offsets[segment]:offsets[segment + 1]], pixels)
+
+    # reassemble the byte planes into big endian samples, then to native order
+    kind = 'i' if dataset.get('PixelRepresentation', 0) else 'u'
+    planes = planes.reshape(samples, width, pixels).transpose(0, 2, 1)
+    values = numpy.ascontiguousarray(planes).view('>%s%d' % (kind, width))
+    values = values.reshape(samples, pixels).astype('=%s%d' % (kind, width))
+    if samples > 1 and dataset.get('PlanarConfiguration', 0) == 0:
+        values = values.T
+    return values.ravel()
+
+
+encaps.register_frame_decoder(RLELossless, decode_frame)
@@ -18,6 +18,8 @@ def Tag(arg, arg2=None):
     """General function for creating a Tag in any of the standard forms:
     e.g.  Tag(0x00100010), Tag(0x10,0x10), Tag((0x10, 0x10))
     """
+    if arg2 is None and type(arg) is BaseTag:
+        return arg  # already a tag, and tags are immutable
     if arg2 is not None:
         arg = (arg, arg2)  # act as if was passed a single tuple
     if isinstance(arg, (tuple, list)):
@@ -49,6 +51,8 @@ else:
 
 class BaseTag(BaseTag_base_class):
     """Class for storing the dicom (group, element) tag"""
+    __slots__ = ()  # no __dict__ next to the int value of every tag
+
     # Override comparisons so can convert "other" to Tag as necessary
     #   See Ordering Comparisons at http://docs.python.org/dev/3.0/whatsnew/3.0.html
 
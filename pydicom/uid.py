@@ -147,6 +147,7 @@ ExplicitVRLittleEndian = UID('1.2.840.10008.1.2.1')
 ImplicitVRLittleEndian = UID('1.2.840.10008.1.2')
 DeflatedExplicitVRLittleEndian = UID('1.2.840.10008.1.2.1.99')
 ExplicitVRBigEndian = UID('1.2.840.10008.1.2.2')
+RLELossless = UID('1.2.840.10008.1.2.5')
 
 NotCompressedPixelTransferSyntaxes = [ExplicitVRLittleEndian,
                                       ImplicitVRLittleEndian,
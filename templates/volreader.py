@@ -8,9 +8,11 @@ function modified for dicom support
 
 import os
 import bpy
+import numpy
 from bgl import *
 #from PIL import Image
 from volume_render.pydicom import read_file
+from volume_render.imagestack import readPlane, stackPlanes
  
 def loadVolume(dirName, filelist, texture):
     """read volume from directory as a 3D texture"""
@@ -24,39 +26,45 @@ def loadVolume(dirName, filelist, texture):
 
     print('loading mages from: %s' % dirName)
 
-    depth = 0
-    width, height = 0, 0
+    paths = []
     for file in files:
         if hasattr(file, 'name'):
-            file_path = os.path.abspath(os.path.join(dirName, file.name))
+            paths.append(os.path.abspath(os.path.join(dirName, file.name)))
         else:
-            file_path = os.path.abspath(os.path.join(dirName, file))
-#        try:
-        # read image
-        #imgData = Image.open(file_path)
-        imgData = bpy.data.images.load(file_path)
+            paths.append(os.path.abspath(os.path.join(dirName, file)))
 
-         # check if all are of the same size
-        if depth is 0:
-            width, height = imgData.size
-            #width, height = img.size[0], img.size[1] 
-            data = Buffer(GL_FLOAT, [len(files), width * height])
-            #data[depth] = img.getdata()
-            data[depth] = list(imgData.pixels)[::4]
-        else:
-            if (width, height) == (imgData.size[0], imgData.size[1]):
-                #data[depth] = img.getdata()
-                data[depth] = list(imgData.pixels)[::4]
-            else:
-                print('mismatch')
-                raise RunTimeError("image size mismatch")
-        depth += 1
-
-        bpy.data.images.remove(imgData)
+    # every page of a multi-page tiff is a slice
+    planes = stackPlanes(paths)
+    depth = len(planes)
+    width, height = 0, 0
+    for z, (file_path, page) in enumerate(planes):
+        # read image, straight into a numpy plane
+        try:
+            plane = readPlane(file_path, page)
+        except ValueError:
+            if page != 0:
+                raise
+            # no NumPy decoder for the format (JPEG without PIL), let Blender read it
+            imgData = bpy.data.images.load(file_path)
+            plane = numpy.array(imgData.pixels[:], numpy.float32)[::imgData.channels]
+            plane = plane.reshape(imgData.size[1], imgData.size[0])
+            bpy.data.images.remove(imgData)
 
-#        except:
-            # skip
-            #print('Invalid image: %s' % file_path)
+         # check if all are of the same size
+        if z == 0:
+            height, width = plane.shape
+            volume = numpy.empty((depth, height * width), numpy.float32)
+        elif plane.shape != (height, width):
+            print('mismatch')
+            raise RuntimeError("image size mismatch")
+
+        # texture values are 0..1 over the range of the image type
+        scale = 1.0
+        if plane.dtype.kind in 'iu':
+            scale = 1.0 / numpy.iinfo(plane.dtype).max
+        numpy.multiply(plane.ravel(), scale, out=volume[z], casting='unsafe')
+
+    data = Buffer(GL_FLOAT, [depth, width * height], volume)
 
     # load image data into single array
     print('volume data dims: %d %d %d' % (width, height, depth))